@@ -0,0 +1,182 @@
+import inspect
+
+def pointwise(effect):
+    """
+    Declare that an effect maps each RGB color independently of its position
+    and of the rest of the image, so it can be baked into a 3D lookup table.
+
+    :param effect: Effect function.
+    :return: The same function, marked as pointwise.
+    """
+    effect.pointwise = True
+    return effect
+
+def is_pointwise(effect):
+    """
+    Check whether an effect has been declared pointwise.
+
+    :param effect: Effect function.
+    :return: True if the effect was decorated with ``pointwise``.
+    """
+    return getattr(effect, "pointwise", False)
+
+def stochastic(effect):
+    """
+    Declare that an effect draws random numbers. It must take a ``seed``
+    argument (integer, numpy.random.Generator or None) and draw only from it.
+
+    :param effect: Effect function.
+    :return: The same function, marked as stochastic.
+    """
+    effect.stochastic = True
+    return effect
+
+def is_stochastic(effect):
+    """
+    Check whether an effect has been declared stochastic.
+
+    :param effect: Effect function.
+    :return: True if the effect was decorated with ``stochastic``.
+    """
+    return getattr(effect, "stochastic", False)
+
+def resolution_independent(effect):
+    """
+    Declare that an effect looks the same whether it runs before or after
+    the image is resized, so it can be applied to a downscaled image.
+
+    :param effect: Effect function.
+    :return: The same function, marked as resolution independent.
+    """
+    effect.resolution_independent = True
+    return effect
+
+def pixel_params(*names):
+    """
+    Declare the parameters of an effect that are measured in pixels (sizes,
+    radii, per-pixel noise amplitudes). They are multiplied by the resize
+    factor when the effect runs on a downscaled image.
+
+    :param names: Parameter names; their defaults are read from the signature.
+    :return: Decorator marking the effect.
+    """
+    def decorate(effect):
+        effect.pixel_params = names
+        return effect
+    return decorate
+
+def is_resolution_independent(effect):
+    """
+    Check whether an effect can run on a downscaled image, possibly with
+    rescaled pixel parameters.
+
+    :param effect: Effect function.
+    :return: True if the effect is pointwise, resolution independent or
+             declares its pixel parameters.
+    """
+    return (
+        is_pointwise(effect)
+        or getattr(effect, "resolution_independent", False)
+        or bool(getattr(effect, "pixel_params", ()))
+    )
+
+def scaled_params(effect, scale):
+    """
+    Rescale the declared pixel parameters of an effect.
+
+    :param effect: Effect function.
+    :param scale: Resize factor (output size / original size).
+    :return: Dict of keyword arguments to pass to the effect.
+    """
+    defaults = inspect.signature(effect).parameters
+    params = {}
+    for name in getattr(effect, "pixel_params", ()):
+        value = defaults[name].default
+        if value is None or value is inspect.Parameter.empty or value == 0:
+            continue
+        if isinstance(value, int):
+            params[name] = max(1, round(value * scale))
+        else:
+            params[name] = value * scale
+    return params
+
+def neighbourhood(radius):
+    """
+    Declare how far, in pixels, an effect reads around each output pixel.
+    Tiled execution crops this much overlap around every tile.
+
+    :param radius: Radius in pixels, or a function taking the effect's
+                   parameters (defaults filled in) as a dict and returning it.
+    :return: Decorator marking the effect.
+    """
+    def decorate(effect):
+        effect.neighbourhood = radius
+        return effect
+    return decorate
+
+def two_pass(collect, apply, merge=sum):
+    """
+    Declare a stats-then-apply form of an effect that depends on global
+    image statistics, so it can run tile by tile. Tiles include the halo of
+    the effect's neighbourhood, if it declares one.
+
+    :param collect: ``collect(tile, box, **params)`` returns the statistics of
+                    the tile's own area ``box`` (relative to the cropped tile).
+    :param apply: ``apply(tile, stats, **params)`` returns the processed tile.
+    :param merge: Combines the list of per-tile statistics; sums them by default.
+    :return: Decorator marking the effect.
+    """
+    def decorate(effect):
+        effect.two_pass = (collect, apply, merge)
+        return effect
+    return decorate
+
+def global_stats(compute, apply):
+    """
+    Declare a form of an effect whose global statistics are computed once
+    from the whole image, typically on a downsampled copy, so only the
+    per-pixel work runs tile by tile. Use it instead of ``two_pass`` when
+    the statistics cannot be merged from tiles without changing the result.
+
+    :param compute: ``compute(image, **params)`` returns the statistics.
+    :param apply: ``apply(tile, stats, **params)`` returns the processed tile.
+    :return: Decorator marking the effect.
+    """
+    def decorate(effect):
+        effect.global_stats = (compute, apply)
+        return effect
+    return decorate
+
+def bound_params(effect, params):
+    """
+    Fill in the defaults of an effect's keyword parameters.
+
+    :param effect: Effect function.
+    :param params: Keyword arguments given by the caller.
+    :return: Dict of every keyword parameter and its value.
+    """
+    values = {
+        name: parameter.default
+        for name, parameter in list(inspect.signature(effect).parameters.items())[1:]
+        if parameter.default is not inspect.Parameter.empty
+    }
+    values.update(params)
+    return values
+
+def effect_radius(effect, params=None):
+    """
+    Look up the neighbourhood radius of an effect.
+
+    :param effect: Effect function.
+    :param params: Keyword arguments the effect will be called with.
+    :return: Radius in pixels (0 for pointwise effects), or None if the
+             effect has not declared one.
+    """
+    radius = getattr(effect, "neighbourhood", None)
+    if callable(radius):
+        return int(radius(bound_params(effect, params or {})))
+    if radius is not None:
+        return radius
+    if is_pointwise(effect):
+        return 0
+    return None
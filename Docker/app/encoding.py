@@ -0,0 +1,133 @@
+import io
+import os
+from PIL import Image
+
+# Save options per profile and Pillow format name. Preview favours encoding
+# speed and small files for the browser; final keeps full chroma and spends
+# time on entropy coding; archive is lossless wherever the format allows.
+ENCODING_PROFILES = {
+    "preview": {
+        "JPEG": {"quality": 80, "subsampling": "4:2:0", "progressive": False, "optimize": False},
+        "PNG": {"compress_level": 1},
+        "WEBP": {"quality": 75, "method": 0},
+    },
+    "final": {
+        "JPEG": {"quality": 92, "subsampling": "4:4:4", "progressive": True, "optimize": True},
+        "PNG": {"compress_level": 6},
+        "WEBP": {"quality": 90, "method": 6},
+    },
+    "archive": {
+        "JPEG": {"quality": 100, "subsampling": "4:4:4", "progressive": True, "optimize": True},
+        "PNG": {"compress_level": 9},
+        "WEBP": {"lossless": True, "quality": 100, "method": 6},
+    },
+}
+
+# Lowest quality tried when shrinking a lossy file to a byte budget.
+MIN_QUALITY = 30
+
+# Modes each format can store; other modes are converted to RGB (or RGBA
+# when the image has transparency and the format supports it).
+FORMAT_MODES = {
+    "JPEG": {"L", "RGB", "RGBX", "CMYK"},
+    "PNG": {"1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"},
+    "WEBP": {"RGB", "RGBA", "RGBX"},
+}
+
+def format_for_path(path):
+    """
+    :return: Pillow format name registered for the file extension, or None.
+    """
+    return Image.registered_extensions().get(os.path.splitext(path)[1].lower())
+
+def save_options(format, profile="final"):
+    """
+    Look up the encoder options of a profile.
+
+    :param format: Pillow format name, e.g. "JPEG".
+    :param profile: Name in ENCODING_PROFILES.
+    :return: Dict of keyword arguments for Image.save; empty for formats the
+             profile does not cover.
+    """
+    if profile not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile '{profile}'")
+    return dict(ENCODING_PROFILES[profile].get(format, {}))
+
+def _prepare(image, format):
+    modes = FORMAT_MODES.get(format)
+    if modes is None or image.mode in modes:
+        return image
+    if "RGBA" in modes and (image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info):
+        return image.convert("RGBA")
+    return image.convert("RGB")
+
+def _write(image, target, format, options):
+    try:
+        image.save(target, format=format, **options)
+    except OSError:
+        if format != "JPEG" or not (options.get("progressive") or options.get("optimize")):
+            raise
+        # Pillow buffers progressive and optimized JPEGs in one block sized
+        # from the pixel count, which very noisy images overflow; baseline
+        # JPEG streams and has no such limit
+        target.seek(0)
+        target.truncate()
+        image.save(target, format=format, **{**options, "progressive": False, "optimize": False})
+
+def encode(image, format, profile="final", max_bytes=None):
+    """
+    Encode an image with the options of a profile.
+
+    With max_bytes, lossy JPEG and WebP output is re-encoded at the highest
+    quality that fits the budget, searched by bisection down to MIN_QUALITY.
+    Lossless output is returned as is.
+
+    :param image: PIL Image object.
+    :param format: Pillow format name.
+    :param profile: Name in ENCODING_PROFILES.
+    :param max_bytes: Maximum size of the encoded file, or None.
+    :return: Encoded bytes.
+    """
+    image = _prepare(image, format)
+    options = save_options(format, profile)
+
+    def attempt(**overrides):
+        buffer = io.BytesIO()
+        _write(image, buffer, format, {**options, **overrides})
+        return buffer.getvalue()
+
+    data = attempt()
+    lossy = format in ("JPEG", "WEBP") and not options.get("lossless")
+    if max_bytes is None or len(data) <= max_bytes or not lossy:
+        return data
+    low, high = MIN_QUALITY, options.get("quality", 75) - 1
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = attempt(quality=quality)
+        if len(candidate) <= max_bytes:
+            best, low = candidate, quality + 1
+        else:
+            high = quality - 1
+    return best if best is not None else attempt(quality=MIN_QUALITY)
+
+def save_image(image, path, profile="final", max_bytes=None, format=None):
+    """
+    Encode an image with a profile and write it to a file.
+
+    :param image: PIL Image object.
+    :param path: Destination path; the format is taken from its extension.
+    :param profile: Name in ENCODING_PROFILES.
+    :param max_bytes: Maximum size of lossy output, or None.
+    :param format: Pillow format name, overriding the extension.
+    :return: Number of bytes written.
+    """
+    format = format or format_for_path(path)
+    if format is None:
+        raise ValueError(f"Unknown image format for '{path}'")
+    with open(path, "wb") as target:
+        if max_bytes is None:
+            _write(_prepare(image, format), target, format, save_options(format, profile))
+        else:
+            target.write(encode(image, format, profile, max_bytes))
+        return target.tell()
@@ -1,12 +1,21 @@
 import numpy as np
 from PIL import Image, ImageOps, ImageEnhance
+from vignette import apply_vignette
+from noise_patterns import pattern_noise
+from effect_traits import resolution_independent, pixel_params, neighbourhood, stochastic
+from seeding import make_rng
+from grain_bank import grain_mask
+from point_luts import apply_lut, FILM_LUT, POLAROID_LUT, LOMO_LUT
 
-def digital_noise_filter(image, noise_level=30):
+@stochastic
+@pixel_params("noise_level")
+@neighbourhood(0)
+def digital_noise_filter(image, noise_level=30, seed=None):
     # Convert the image to a numpy array
     np_image = np.array(image)
     
     # Generate random noise
-    noise = np.random.randint(-noise_level, noise_level, np_image.shape, dtype='int16')
+    noise = make_rng(seed).integers(-noise_level, noise_level, np_image.shape, dtype='int16')
     
     # Add the noise to the image and clip the values to be in valid range [0, 255]
     np_image = np.clip(np_image + noise, 0, 255).astype('uint8')
@@ -16,20 +25,20 @@ def digital_noise_filter(image, noise_level=30):
     
     return noisy_image
 
-def spatial_noise_filter(image, random_noise_level=30, patterned_noise_level=20, pattern_frequency=10):
+@stochastic
+@pixel_params("random_noise_level", "pattern_frequency")
+def spatial_noise_filter(image, random_noise_level=30, patterned_noise_level=20, pattern_frequency=10, pattern="sinusoidal", seed=None):
     # Convert the image to a numpy array
     np_image = np.array(image)
     
     # Generate random noise
-    random_noise = np.random.randint(-random_noise_level, random_noise_level, np_image.shape, dtype='int16')
+    random_noise = make_rng(seed).integers(-random_noise_level, random_noise_level, np_image.shape, dtype='int16')
     
-    # Generate patterned noise (e.g., sinusoidal pattern)
-    patterned_noise = np.zeros_like(np_image, dtype='int16')
-    rows, cols, _ = np_image.shape
-    for row in range(rows):
-        for col in range(cols):
-            # Create a pattern frequency dependent noise
-            patterned_noise[row, col] = int(patterned_noise_level * np.sin(2 * np.pi * (row / pattern_frequency) * np.sin(2 * np.pi * (col / pattern_frequency))))
+    # Generate patterned noise (e.g., sinusoidal pattern), shared by all channels
+    rows, cols = np_image.shape[:2]
+    patterned_noise = pattern_noise(pattern, rows, cols, patterned_noise_level, pattern_frequency)
+    if np_image.ndim == 3:
+        patterned_noise = patterned_noise[:, :, None]
     
     # Add the random noise and patterned noise to the image
     np_image = np.clip(np_image + random_noise + patterned_noise, 0, 255).astype('uint8')
@@ -39,13 +48,16 @@ def spatial_noise_filter(image, random_noise_level=30, patterned_noise_level=20,
     
     return noisy_image
 
-def luminance_noise_filter(image, noise_level=30):
+@stochastic
+@pixel_params("noise_level")
+@neighbourhood(0)
+def luminance_noise_filter(image, noise_level=30, seed=None):
     # Convert the image to grayscale (luminance channel)
     luminance = image.convert("L")
     np_luminance = np.array(luminance)
     
     # Generate random noise
-    noise = np.random.randint(-noise_level, noise_level, np_luminance.shape, dtype='int16')
+    noise = make_rng(seed).integers(-noise_level, noise_level, np_luminance.shape, dtype='int16')
     
     # Add the noise to the luminance channel and clip the values to be in valid range [0, 255]
     np_luminance = np.clip(np_luminance + noise, 0, 255).astype('uint8')
@@ -65,13 +77,16 @@ def luminance_noise_filter(image, noise_level=30):
     
     return noisy_image
 
-def fpn_filter(image, noise_level=30):
+@stochastic
+@pixel_params("noise_level")
+@neighbourhood(0)
+def fpn_filter(image, noise_level=30, seed=None):
     # Convert the image to a numpy array
     np_image = np.array(image)
     
     # Generate fixed pattern noise
     rows, cols, _ = np_image.shape
-    fpn_noise = np.random.randint(-noise_level, noise_level, (rows, cols, 1), dtype='int16')
+    fpn_noise = make_rng(seed).integers(-noise_level, noise_level, (rows, cols, 1), dtype='int16')
     fpn_noise = np.repeat(fpn_noise, 3, axis=2)
     
     # Add the fixed pattern noise to the image and clip the values to be in valid range [0, 255]
@@ -82,17 +97,27 @@ def fpn_filter(image, noise_level=30):
     
     return noisy_image
 
+def _pattern_noise_filter(pattern):
+    # Spatial noise with a fixed pattern, registered under its own name
+    @stochastic
+    @pixel_params("random_noise_level", "pattern_frequency")
+    def pattern_noise_filter(image, random_noise_level=30, patterned_noise_level=20, pattern_frequency=10, seed=None):
+        return spatial_noise_filter(image, random_noise_level, patterned_noise_level, pattern_frequency, pattern, seed)
+    return pattern_noise_filter
+
 def generate_grain_mask(img_width, img_height, grain_size, seed=None):
     """
     Generate a grain mask for adding film grain effect.
+    
+    The mask is tiled from the precomputed grain bank. Grain used to be
+    normalized to span 0-255, which cancels grain_size; the banked mask
+    reproduces the resulting amplitude for the image size.
+    
+    :param seed: Integer seed, numpy.random.Generator, or None for a new pattern.
     """
-    np.random.seed(seed)
-    noise = np.random.normal(loc=0, scale=grain_size, size=(img_height, img_width))
-    noise = np.clip(noise, -255, 255)  # Ensure the noise is within pixel value range
-    noise = (noise - noise.min()) / (noise.max() - noise.min()) * 255  # Normalize noise to 0-255
-    mask = Image.fromarray(noise.astype(np.uint8))
-    return mask
+    return Image.fromarray(grain_mask(img_width, img_height, seed))
 
+@stochastic
 def apply_bw_grain(image, grain_size=10, seed=None):
     """
     Apply black and white film grain to an image.
@@ -108,6 +133,7 @@ def apply_bw_grain(image, grain_size=10, seed=None):
     
     return grain_image
 
+@stochastic
 def apply_color_grain(image, grain_size=10, seed=None):
     """
     Apply color film grain to an image.
@@ -126,30 +152,23 @@ def apply_color_grain(image, grain_size=10, seed=None):
     
     return grain_image
 
+@resolution_independent
 def movie_film_effect(image):
-    image = image.convert("RGB")
-    r, g, b = image.split()
-    r = r.point(lambda i: i * 1.2)
-    g = g.point(lambda i: i * 1.1)
-    b = b.point(lambda i: i * 0.9)
-    image = Image.merge("RGB", (r, g, b))
+    image = apply_lut(image.convert("RGB"), FILM_LUT)
     enhancer = ImageEnhance.Contrast(image)
     image = enhancer.enhance(1.5)
     return image
 
+@resolution_independent
 def polaroid_effect(image):
-    image = image.convert("RGB")
-    r, g, b = image.split()
-    r = r.point(lambda i: i * 1.1)
-    g = g.point(lambda i: i * 1.1)
-    b = b.point(lambda i: i * 1.3)
-    image = Image.merge("RGB", (r, g, b))
+    image = apply_lut(image.convert("RGB"), POLAROID_LUT)
     enhancer = ImageEnhance.Contrast(image)
     image = enhancer.enhance(0.8)
     green_overlay = Image.new("RGB", image.size, (0, 50, 0))
     image = Image.blend(image, green_overlay, alpha=0.2)
     return image
 
+@resolution_independent
 def lomo_filter(image):
     # Step 1: Increase saturation to create vivid colors
     image = ImageEnhance.Color(image).enhance(1.5)
@@ -158,22 +177,10 @@ def lomo_filter(image):
     image = ImageEnhance.Contrast(image).enhance(1.5)
     
     # Step 3: Apply a vignette effect
-    width, height = image.size
-    vignette = Image.new('L', (width, height), 0)
-    for x in range(width):
-        for y in range(height):
-            dx = x - width / 2
-            dy = y - height / 2
-            # Distance normalized to 0..1, then inverted and scaled to 0..255
-            d = np.sqrt(dx*dx + dy*dy) / (np.sqrt(width*width + height*height) / 2)
-            vignette.putpixel((x, y), int((1 - d) * 255))
-    image = Image.composite(image, ImageOps.colorize(vignette, (0, 0, 0), (255, 255, 255)), vignette)
+    image = apply_vignette(image)
     
     # Step 4: Slightly adjust the hue to mimic Lomo camera color cast
-    r, g, b = image.split()
-    r = r.point(lambda i: i * 1.1)
-    b = b.point(lambda i: i * 0.9)
-    image = Image.merge("RGB", (r, g, b))
+    image = apply_lut(image, LOMO_LUT)
     
     return image
 
@@ -181,6 +188,9 @@ def lomo_filter(image):
 noise_effects = {
     "Digital Noise": digital_noise_filter,
     "Spatial Noise": spatial_noise_filter,
+    "Banding Noise": _pattern_noise_filter("banding"),
+    "Moire Noise": _pattern_noise_filter("moire"),
+    "Sensor Line Noise": _pattern_noise_filter("sensor_line"),
     "Luminance Noise": luminance_noise_filter,
     "Fixed Pattern Noise": fpn_filter,
     "BW Grain": apply_bw_grain,
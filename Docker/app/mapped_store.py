@@ -0,0 +1,158 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+import numpy as np
+from PIL import Image
+from shared_frames import MODE_BYTES, frame_rawmode
+
+# File layout: a fixed-size header, then the pixels in the frame layout of
+# shared_frames, which pads RGB to four bytes a pixel so Pillow can map it
+# in place. The header is padded so the pixels start page-aligned.
+MAGIC = b"XIMGRAW2"
+HEADER = struct.Struct("<8s8sIII")
+HEADER_SIZE = 4096
+
+def _store_name(path, stat):
+    # One file per source path and version of its content
+    key = f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+    return hashlib.sha256(key.encode()).hexdigest() + ".pix"
+
+def write_mapped(target_path, image):
+    """
+    Write an image's raw pixels with a header describing them.
+
+    :param target_path: File to write; it is replaced atomically.
+    :param image: PIL Image object in one of shared_frames.MODE_BYTES.
+    """
+    header = HEADER.pack(MAGIC, image.mode.encode(), image.size[0], image.size[1], MODE_BYTES[image.mode])
+    temp_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as target:
+        target.write(header.ljust(HEADER_SIZE, b"\0"))
+        target.write(image.tobytes("raw", frame_rawmode(image.mode)))
+    os.replace(temp_path, target_path)
+
+def read_mapped(source_path):
+    """
+    Map an image written by write_mapped without reading it into memory.
+
+    Images use the mapped pages directly and stay read-only until modified.
+    RGB images come back in RGBX mode, Pillow's in-place view of padded RGB;
+    convert them to RGB where a consumer needs that mode.
+
+    :param source_path: File written by write_mapped.
+    :return: PIL Image object.
+    :raises ValueError: If the file is not a mapped image.
+    """
+    with open(source_path, "rb") as source:
+        magic, mode, width, height, channels = HEADER.unpack(source.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"'{source_path}' is not a mapped image")
+    mode = mode.rstrip(b"\0").decode()
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    pixels = np.memmap(source_path, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=shape)
+    return Image.frombuffer(mode, (width, height), pixels, "raw", frame_rawmode(mode), 0, 1)
+
+class MappedImageStore:
+    """
+    Folder of decoded images shared by all worker processes of a server.
+
+    The first process to open an image decodes it and writes its raw pixels
+    to a file; every process then maps that file instead of decoding again.
+    Files are named after the source path, modification time and size, so a
+    replaced source gets a new file. Files unused for ``ttl`` seconds are
+    deleted, then the least recently used ones until the folder fits its
+    disk budget; use is recorded in the file's modification time so all
+    processes share it.
+    """
+    def __init__(self, folder, max_bytes=2 * 1024 * 1024 * 1024, ttl=3600):
+        """
+        :param folder: Folder of the store, created if missing.
+        :param max_bytes: Maximum total size of the stored files.
+        :param ttl: Seconds an unused file is kept, or None.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(folder, exist_ok=True)
+
+    def get(self, path):
+        """
+        Open an image through the store, decoding and storing it on first use.
+
+        :param path: Image file path.
+        :return: PIL Image object.
+        """
+        stored_path = os.path.join(self.folder, _store_name(path, os.stat(path)))
+        try:
+            image = read_mapped(stored_path)
+        except (FileNotFoundError, ValueError, struct.error):
+            pass
+        else:
+            try:
+                os.utime(stored_path)
+            except FileNotFoundError:
+                pass
+            return image
+        image = Image.open(path)
+        image.load()
+        if image.mode in MODE_BYTES:
+            write_mapped(stored_path, image)
+            self.evict()
+        return image
+
+    def invalidate(self, path):
+        """
+        Delete the stored pixels of the current version of a file.
+
+        :param path: Image file path.
+        """
+        try:
+            os.remove(os.path.join(self.folder, _store_name(path, os.stat(path))))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        Delete expired files, then the least recently used ones beyond the
+        disk budget. Processes that still map a deleted file keep their view.
+
+        :return: Number of files deleted.
+        """
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith(".pix"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, entry_path in entries:
+            expired = self.ttl is not None and now - mtime > self.ttl
+            if not expired and total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
+
+def get_mapped_store(app):
+    """
+    :param app: Flask app.
+    :return: The app's mapped image store, created from its config on first use.
+    """
+    if "mapped_store" not in app.extensions:
+        app.extensions.setdefault("mapped_store", MappedImageStore(
+            app.config["MAPPED_STORE_FOLDER"],
+            app.config["MAPPED_STORE_MAX_BYTES"],
+            app.config["MAPPED_STORE_TTL"],
+        ))
+    return app.extensions["mapped_store"]
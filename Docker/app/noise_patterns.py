@@ -0,0 +1,101 @@
+from functools import lru_cache
+import numpy as np
+
+# Patterns are cached per (kind, shape, level, frequency) so repeated calls
+# on same-sized images reuse the array instead of regenerating it. Full-frame
+# patterns take 2 bytes a pixel, so only the last couple are kept.
+PATTERN_CACHE_SIZE = 2
+
+def sinusoidal_pattern(rows, cols, level, frequency):
+    """
+    Nested sine pattern used by the original spatial noise filter.
+
+    :param rows: Pattern height in pixels.
+    :param cols: Pattern width in pixels.
+    :param level: Peak amplitude of the pattern.
+    :param frequency: Pattern period in pixels.
+    :return: Float array of shape (rows, cols).
+    """
+    row = np.arange(rows, dtype=np.float64)[:, None]
+    col = np.arange(cols, dtype=np.float64)
+    return level * np.sin(2 * np.pi * (row / frequency) * np.sin(2 * np.pi * (col / frequency)))
+
+def banding_pattern(rows, cols, level, frequency):
+    """
+    Horizontal banding, as produced by uneven sensor readout.
+
+    :param rows: Pattern height in pixels.
+    :param cols: Pattern width in pixels.
+    :param level: Peak amplitude of the bands.
+    :param frequency: Band period in pixels.
+    :return: Float array of shape (rows, cols).
+    """
+    row = np.arange(rows, dtype=np.float64)[:, None]
+    bands = level * np.sin(2 * np.pi * (row / frequency))
+    return np.broadcast_to(bands, (rows, cols))
+
+def moire_pattern(rows, cols, level, frequency):
+    """
+    Interference of two slightly rotated gratings.
+
+    :param rows: Pattern height in pixels.
+    :param cols: Pattern width in pixels.
+    :param level: Peak amplitude of the pattern.
+    :param frequency: Grating period in pixels.
+    :return: Float array of shape (rows, cols).
+    """
+    row = np.arange(rows, dtype=np.float64)[:, None]
+    col = np.arange(cols, dtype=np.float64)
+    angle = np.deg2rad(5)
+    grating_a = np.sin(2 * np.pi * col / frequency)
+    grating_b = np.sin(2 * np.pi * (col * np.cos(angle) + row * np.sin(angle)) / frequency)
+    return level * grating_a * grating_b
+
+def sensor_line_pattern(rows, cols, level, frequency):
+    """
+    Bright and dark sensor lines every ``frequency`` rows.
+
+    :param rows: Pattern height in pixels.
+    :param cols: Pattern width in pixels.
+    :param level: Offset applied to the affected lines.
+    :param frequency: Spacing between affected lines in pixels.
+    :return: Float array of shape (rows, cols).
+    """
+    period = max(1, int(frequency))
+    row = np.arange(rows)
+    lines = np.zeros(rows, dtype=np.float64)
+    hit = row % period == 0
+    # Alternate the sign so lines do not shift overall brightness
+    lines[hit] = np.where((row[hit] // period) % 2 == 0, level, -level)
+    return np.broadcast_to(lines[:, None], (rows, cols))
+
+PATTERN_GENERATORS = {
+    "sinusoidal": sinusoidal_pattern,
+    "banding": banding_pattern,
+    "moire": moire_pattern,
+    "sensor_line": sensor_line_pattern,
+}
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def pattern_noise(kind, rows, cols, level, frequency):
+    """
+    Return a cached integer noise pattern.
+
+    :param kind: Name of a generator in PATTERN_GENERATORS.
+    :param rows: Pattern height in pixels.
+    :param cols: Pattern width in pixels.
+    :param level: Peak amplitude of the pattern.
+    :param frequency: Pattern period in pixels.
+    :return: Read-only int16 array of shape (rows, cols); patterns that vary
+             only by row are a broadcast view of a single column.
+    """
+    if kind not in PATTERN_GENERATORS:
+        raise ValueError(f"Unknown noise pattern '{kind}'")
+    pattern = PATTERN_GENERATORS[kind](rows, cols, level, frequency)
+    # astype truncates toward zero like int()
+    if pattern.strides[1] == 0:
+        # Keep row profiles broadcast so the cache holds one column, not a frame
+        return np.broadcast_to(pattern[:, :1].astype(np.int16), (rows, cols))
+    pattern = pattern.astype(np.int16)
+    pattern.flags.writeable = False
+    return pattern
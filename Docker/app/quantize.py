@@ -0,0 +1,158 @@
+from functools import lru_cache
+import numpy as np
+from PIL import Image
+from scipy.spatial import cKDTree
+
+# Palettes are fitted on at most this many pixels.
+DEFAULT_SAMPLE_SIZE = 1 << 16
+
+# Colors are looked up on a 32x32x32 grid (5 bits per channel).
+LUT_BITS = 5
+
+BAYER_4X4 = np.array([
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5],
+])
+
+def downsample(image, sample_size=DEFAULT_SAMPLE_SIZE):
+    """
+    Shrink an image to roughly ``sample_size`` pixels with a box reduction.
+    """
+    factor = int(np.sqrt(image.size[0] * image.size[1] / sample_size))
+    return image.reduce(factor) if factor > 1 else image
+
+def _random_sample(image, sample_size, rng):
+    pixels = np.asarray(image).reshape(-1, 3)
+    if len(pixels) <= sample_size:
+        return pixels.astype(np.float64)
+    return pixels[rng.choice(len(pixels), sample_size, replace=False)].astype(np.float64)
+
+def median_cut_palette(image, num_colors=256, sample_size=DEFAULT_SAMPLE_SIZE):
+    """
+    Fit a palette with median cut on a downsampled copy of the image.
+
+    :param image: RGB PIL Image object.
+    :param num_colors: Maximum number of palette colors (up to 256).
+    :param sample_size: Approximate number of pixels to fit on.
+    :return: (N, 3) uint8 array, N <= num_colors.
+    """
+    small = downsample(image, sample_size)
+    quantized = small.quantize(colors=num_colors, method=Image.Quantize.MEDIANCUT)
+    palette = np.array(quantized.getpalette(), dtype=np.uint8).reshape(-1, 3)
+    used = np.unique(np.asarray(quantized))
+    return palette[used]
+
+def kmeans_palette(image, num_colors=256, sample_size=DEFAULT_SAMPLE_SIZE, iterations=30, batch_size=4096, seed=0):
+    """
+    Fit a palette with mini-batch k-means on a random subset of pixels.
+
+    The centres start from a median-cut palette and are refined with
+    per-centre learning rates, one batch at a time.
+
+    :param image: RGB PIL Image object.
+    :param num_colors: Maximum number of palette colors (up to 256).
+    :param sample_size: Number of pixels sampled for fitting.
+    :param iterations: Number of mini-batches.
+    :param batch_size: Pixels per mini-batch.
+    :param seed: Seed for the pixel sampling, so palettes are reproducible.
+    :return: (N, 3) uint8 array, N <= num_colors.
+    """
+    rng = np.random.default_rng(seed)
+    samples = _random_sample(image, sample_size, rng)
+    centres = median_cut_palette(image, num_colors, sample_size).astype(np.float64)
+    counts = np.zeros(len(centres))
+    for _ in range(iterations):
+        batch = samples[rng.integers(0, len(samples), batch_size)]
+        _, nearest = cKDTree(centres).query(batch)
+        hits = np.bincount(nearest, minlength=len(centres))
+        counts += hits
+        moved = hits > 0
+        for c in range(3):
+            sums = np.bincount(nearest, weights=batch[:, c], minlength=len(centres))
+            centres[moved, c] += (sums[moved] - hits[moved] * centres[moved, c]) / counts[moved]
+    return np.unique(np.rint(centres).astype(np.uint8), axis=0)
+
+PALETTE_METHODS = {
+    "median_cut": median_cut_palette,
+    "kmeans": kmeans_palette,
+}
+
+def fit_palette(image, num_colors=256, method="median_cut", sample_size=DEFAULT_SAMPLE_SIZE):
+    """
+    Fit an adaptive palette on a subset of the image pixels.
+
+    :param image: PIL Image object.
+    :param num_colors: Maximum number of palette colors (up to 256).
+    :param method: One of PALETTE_METHODS ('median_cut' or 'kmeans').
+    :param sample_size: Approximate number of pixels to fit on.
+    :return: (N, 3) uint8 array.
+    """
+    if method not in PALETTE_METHODS:
+        raise ValueError(f"Unknown palette method '{method}'")
+    return PALETTE_METHODS[method](image.convert("RGB"), num_colors, sample_size)
+
+@lru_cache(maxsize=16)
+def _nearest_lut(palette_bytes):
+    palette = np.frombuffer(palette_bytes, dtype=np.uint8).reshape(-1, 3)
+    cells = 1 << LUT_BITS
+    centres = (np.arange(cells) << (8 - LUT_BITS)) + (1 << (7 - LUT_BITS)) - 0.5
+    r, g, b = np.meshgrid(centres, centres, centres, indexing="ij")
+    _, nearest = cKDTree(palette.astype(np.float64)).query(np.stack([r, g, b], axis=-1).reshape(-1, 3))
+    lut = nearest.astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+def nearest_color_lut(palette):
+    """
+    Precompute the nearest palette index for every cell of a 32x32x32 RGB grid.
+
+    :param palette: (N, 3) uint8 array, N <= 256.
+    :return: Cached read-only uint8 array of 32768 palette indices, indexed
+             by ``(r >> 3) << 10 | (g >> 3) << 5 | (b >> 3)``.
+    """
+    return _nearest_lut(np.ascontiguousarray(palette, dtype=np.uint8).tobytes())
+
+def map_to_palette(image, palette, dither=False, dither_spread=None):
+    """
+    Map every pixel to a palette index through the nearest-color lookup table.
+
+    :param image: PIL Image object.
+    :param palette: (N, 3) uint8 array, N <= 256.
+    :param dither: Apply 4x4 ordered (Bayer) dithering before the lookup.
+    :param dither_spread: Dither amplitude in 8-bit levels; defaults to the
+                          typical spacing between palette colors.
+    :return: "P" mode image using ``palette``.
+    """
+    palette = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)
+    rgb = np.asarray(image.convert("RGB"))
+    height, width = rgb.shape[:2]
+    if dither:
+        if dither_spread is None:
+            dither_spread = 255 / max(1.0, np.cbrt(len(palette)))
+        threshold = ((BAYER_4X4 + 0.5) / 16 - 0.5) * dither_spread
+        offsets = np.tile(np.rint(threshold).astype(np.int16), (height // 4 + 1, width // 4 + 1))[:height, :width]
+        rgb = np.clip(rgb + offsets[:, :, None], 0, 255).astype(np.uint8)
+    shift = 8 - LUT_BITS
+    cells = (rgb[:, :, 0] >> shift).astype(np.uint16) << (2 * LUT_BITS)
+    cells |= (rgb[:, :, 1] >> shift).astype(np.uint16) << LUT_BITS
+    cells |= rgb[:, :, 2] >> shift
+    indices = np.take(nearest_color_lut(palette), cells)
+    quantized = Image.frombytes("P", (width, height), indices.tobytes())
+    quantized.putpalette(palette.ravel().tolist())
+    return quantized
+
+def quantize(image, num_colors=256, method="median_cut", dither=False, sample_size=DEFAULT_SAMPLE_SIZE):
+    """
+    Quantize an image: fit a palette on a pixel subset, then map every pixel.
+
+    :param image: PIL Image object.
+    :param num_colors: Maximum number of palette colors (up to 256).
+    :param method: One of PALETTE_METHODS.
+    :param dither: Apply ordered dithering when mapping.
+    :param sample_size: Approximate number of pixels to fit on.
+    :return: Tuple of ("P" mode image, (N, 3) uint8 palette array).
+    """
+    palette = fit_palette(image, num_colors, method, sample_size)
+    return map_to_palette(image, palette, dither), palette
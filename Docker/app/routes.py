@@ -1,12 +1,91 @@
-from flask import Blueprint, request, render_template, redirect, url_for, send_from_directory, session, current_app
+from flask import Blueprint, request, render_template, redirect, url_for, send_from_directory, send_file, session, current_app, jsonify, abort
 import os
-from utils import allowed_file, save_file, process_image
+import secrets
+import shutil
+from utils import allowed_file, save_file, process_image, make_proxy, forget_upload
+import jobs
+import result_cache
 import effects_aggregator
+from effect_traits import is_stochastic
 from werkzeug.utils import secure_filename
 from PIL import Image
 
 main = Blueprint('main', __name__)
 
+def _process_in_app(app, *args, **kwargs):
+    # Job workers run outside any request, so they need their own app context
+    with app.app_context():
+        return process_image(*args, **kwargs)
+
+def _effect_params(effect, seed):
+    # Stochastic effects get the session's seed, so the saved render draws
+    # the same noise as the preview
+    if effect in effects_aggregator.effects and is_stochastic(effects_aggregator.effects[effect]):
+        return {'seed': seed}
+    return {}
+
+def _remove_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def enqueue_effect(filename, effect):
+    """
+    Queue an effect on the preview proxy of an uploaded image.
+
+    Every job writes its own file, so a job that finishes late never
+    overwrites the result of one queued after it. The session's previous
+    preview job is cancelled and its file deleted, including a file it
+    writes after being cancelled. The effect and its seed become the
+    session's applied effect only once the job succeeds (see _commit_preview).
+
+    :param filename: Name of the uploaded file.
+    :param effect: Name of the effect to apply.
+    :return: Job ID.
+    :raises jobs.QueueFull: If the job queue is full.
+    """
+    app = current_app._get_current_object()
+    queue = jobs.get_job_queue(app)
+    input_image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    proxy = None
+    if session.get('proxy_scale') is not None:
+        proxy = (os.path.join(app.config['PROXY_FOLDER'], filename), session['proxy_scale'])
+    seed = secrets.randbits(32)
+    stem, extension = os.path.splitext(filename)
+    output_name = f'{stem}-{secrets.token_hex(8)}{extension}'
+    # A stale preview would keep a worker busy for a result nobody will see
+    previous_job = session.get('preview_job')
+    queue.cancel(previous_job)
+    _remove_file(queue.result(previous_job))
+    job_id = queue.submit(_process_in_app, app, input_image_path, effect, params=_effect_params(effect, seed),
+                          proxy=proxy, output_name=output_name, discard=_remove_file)
+    session['preview_job'] = job_id
+    session['pending_effect'] = {'job': job_id, 'effect': effect, 'seed': seed}
+    return job_id
+
+def _commit_preview():
+    # Adopt the effect of the session's last preview once its job has
+    # succeeded; a failed or cancelled preview leaves the applied effect as is
+    pending = session.get('pending_effect')
+    if not pending:
+        return
+    status = jobs.get_job_queue(current_app).status(pending['job'])
+    if status is None or status['status'] in jobs.FINAL_STATES:
+        session.pop('pending_effect')
+        if status is not None and status['status'] == jobs.DONE:
+            session['effect'], session['seed'] = pending['effect'], pending['seed']
+
+def _forget_session_upload():
+    # The session's previous upload and its proxy will not be used again
+    if 'filename' in session:
+        forget_upload(os.path.join(current_app.config['UPLOAD_FOLDER'], session['filename']),
+                      os.path.join(current_app.config['PROXY_FOLDER'], session['filename']))
+
+def _preview_url(filename):
+    # Proxy of the upload if it has one, else the upload itself
+    if session.get('proxy_scale') is not None:
+        return url_for('main.proxy_file', filename=filename)
+    return url_for('main.uploaded_file', filename=filename)
+
 @main.route('/', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
@@ -17,27 +96,47 @@ def upload_file():
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 input_image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+                _forget_session_upload()
                 file.save(input_image_path)
+                _, session['proxy_scale'] = make_proxy(input_image_path, current_app.config['PROXY_FOLDER'], current_app.config['PROXY_SIZE'])
                 session['filename'] = filename
-                return render_template('upload.html', filename=filename, effects=effects_aggregator.effects.keys())
+                for key in ('effect', 'seed', 'pending_effect'):
+                    session.pop(key, None)
+                return render_template('upload.html', filename=filename, effects=effects_aggregator.effects.keys(), preview_url=_preview_url(filename))
         if 'filename' in session:
             filename = session['filename']
             if 'effect' in request.form:
                 selected_effect = request.form.get('effect')
-                input_image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                output_image_path = process_image(input_image_path, selected_effect)
-                return render_template('upload.html', filename=filename, effects=effects_aggregator.effects.keys(), processed=True)
+                try:
+                    job_id = enqueue_effect(filename, selected_effect)
+                except jobs.QueueFull:
+                    abort(503)
+                return render_template('upload.html', filename=filename, effects=effects_aggregator.effects.keys(), job_id=job_id, preview_url=_preview_url(filename))
     return render_template('upload.html', effects=effects_aggregator.effects.keys())
 
 @main.route('/save', methods=['POST'])
 def save():
     if 'filename' in session:
         filename = session['filename']
-        processed_image_path = os.path.join(current_app.config['PROCESSED_FOLDER'], filename)
         save_path = os.path.join('saved_images', filename)
         if not os.path.exists('saved_images'):
             os.makedirs('saved_images')
-        os.rename(processed_image_path, save_path)
+        _commit_preview()
+        if 'effect' in session:
+            # The preview was rendered from the proxy and encoded for speed;
+            # render the saved copy from the full resolution upload with the
+            # final encoding profile, on the job queue like the preview
+            app = current_app._get_current_object()
+            input_image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            try:
+                job_id = jobs.get_job_queue(app).submit(
+                    _process_in_app, app, input_image_path, session['effect'], output_folder='saved_images', final=True,
+                    params=_effect_params(session['effect'], session.get('seed')))
+            except jobs.QueueFull:
+                abort(503)
+            return render_template('upload.html', filename=filename, effects=effects_aggregator.effects.keys(),
+                                   job_id=job_id, job_kind='save', preview_url=_preview_url(filename))
+        shutil.copyfile(os.path.join(current_app.config['UPLOAD_FOLDER'], filename), save_path)
         return redirect(url_for('main.upload_file'))
     return redirect(url_for('main.upload_file'))
 
@@ -45,7 +144,62 @@ def save():
 def uploaded_file(filename):
     return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
 
+@main.route('/proxies/<filename>')
+def proxy_file(filename):
+    return send_from_directory(current_app.config['PROXY_FOLDER'], filename)
+
 @main.route('/processed/<filename>')
 def processed_file(filename):
     return send_from_directory(current_app.config['PROCESSED_FOLDER'], filename)
 
+
+@main.route('/jobs', methods=['POST'])
+def create_job():
+    if 'filename' not in session:
+        return jsonify(error='No uploaded image'), 400
+    effect = request.form.get('effect') or (request.get_json(silent=True) or {}).get('effect')
+    if effect not in effects_aggregator.effects:
+        return jsonify(error=f"Unknown effect '{effect}'"), 400
+    try:
+        job_id = enqueue_effect(session['filename'], effect)
+    except jobs.QueueFull as e:
+        return jsonify(error=str(e)), 503
+    return jsonify(job_id=job_id, status_url=url_for('main.job_status', job_id=job_id)), 202
+
+@main.route('/jobs/<job_id>')
+def job_status(job_id):
+    _commit_preview()
+    status = jobs.get_job_queue(current_app).status(job_id)
+    if status is None:
+        return jsonify(error='Unknown job'), 404
+    if status['status'] == jobs.DONE:
+        status['result_url'] = url_for('main.job_result', job_id=job_id)
+    return jsonify(status)
+
+@main.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    queue = jobs.get_job_queue(current_app)
+    status = queue.status(job_id)
+    if status is None:
+        return jsonify(error='Unknown job'), 404
+    if status['status'] != jobs.DONE:
+        return jsonify(status), 409
+    result_path = queue.result(job_id)
+    if not os.path.exists(result_path):
+        # Replaced by a newer preview of the same session
+        return jsonify(error='Result no longer available'), 410
+    return send_file(os.path.abspath(result_path))
+
+@main.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    queue = jobs.get_job_queue(current_app)
+    if queue.status(job_id) is None:
+        return jsonify(error='Unknown job'), 404
+    cancelled = queue.cancel(job_id)
+    return jsonify(queue.status(job_id)), 200 if cancelled else 409
+
+@main.route('/cache/stats')
+def cache_stats():
+    if not current_app.config.get('RESULT_CACHE_FOLDER'):
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **result_cache.get_result_cache(current_app).stats())
@@ -0,0 +1,95 @@
+from multiprocessing import shared_memory
+import numpy as np
+from PIL import Image
+
+# Bytes per pixel of the frame layout, matching image.tobytes() except for
+# RGB, which is padded to four bytes a pixel so Pillow can map it in place.
+MODE_BYTES = {"L": 1, "LA": 2, "RGB": 4, "RGBA": 4, "RGBX": 4, "CMYK": 4}
+
+# Raw layouts of the modes not stored as image.tobytes() lays them out.
+FRAME_RAWMODES = {"RGB": "RGBX"}
+
+def frame_rawmode(mode):
+    """
+    :return: Pillow raw mode of the frame layout of an image mode.
+    """
+    return FRAME_RAWMODES.get(mode, mode)
+
+def frame_nbytes(mode, size):
+    """
+    :return: Bytes needed to hold an image of this mode and size.
+    """
+    return size[0] * size[1] * MODE_BYTES[mode]
+
+def create_frame(nbytes):
+    """
+    Allocate a shared memory block for one frame. The creating process owns
+    it and must release it with ``unlink=True``.
+
+    :param nbytes: Size of the block.
+    :return: SharedMemory object.
+    """
+    return shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+
+def attach_frame(name):
+    """
+    Open a shared memory block created by another process.
+
+    :param name: Block name from a frame descriptor.
+    :return: SharedMemory object; release it without unlinking.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+def release_frame(block, unlink=False):
+    """
+    Close a shared memory block, and free it if this process owns it.
+    """
+    block.close()
+    if unlink:
+        block.unlink()
+
+def write_frame(block, image, offset=0):
+    """
+    Copy an image's pixels into a shared memory block.
+
+    :param block: SharedMemory object with room for the image.
+    :param image: PIL Image object in one of MODE_BYTES.
+    :param offset: Byte offset of the frame within the block.
+    :return: Descriptor dict (name, mode, size, shape, dtype, offset) that
+             lets another process open the frame without copying.
+    """
+    nbytes = frame_nbytes(image.mode, image.size)
+    if offset + nbytes > block.size:
+        raise ValueError(f"Frame of {nbytes} bytes does not fit in block of {block.size} bytes")
+    block.buf[offset:offset + nbytes] = image.tobytes("raw", frame_rawmode(image.mode))
+    channels = MODE_BYTES[image.mode]
+    width, height = image.size
+    return {
+        "name": block.name,
+        "mode": image.mode,
+        "size": image.size,
+        "shape": (height, width) if channels == 1 else (height, width, channels),
+        "dtype": "uint8",
+        "offset": offset,
+    }
+
+def read_frame(block, descriptor):
+    """
+    Open a frame stored in a shared memory block as a PIL image.
+
+    L, RGB, RGBA, RGBX and CMYK frames are mapped in place by
+    Image.frombuffer and stay read-only views of the block, so they must be
+    dropped before the block is released. RGB frames come back in RGBX mode;
+    convert them to RGB where a consumer needs that mode. LA is unpacked
+    into Pillow's own layout.
+
+    :param block: SharedMemory object holding the frame.
+    :param descriptor: Dict returned by write_frame.
+    :return: PIL Image object.
+    """
+    mode = descriptor["mode"]
+    nbytes = int(np.prod(descriptor["shape"]))
+    data = block.buf[descriptor["offset"]:descriptor["offset"] + nbytes]
+    image = Image.frombuffer(mode, tuple(descriptor["size"]), data, "raw", frame_rawmode(mode), 0, 1)
+    del data
+    return image
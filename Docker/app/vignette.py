@@ -0,0 +1,63 @@
+from functools import lru_cache
+import numpy as np
+from PIL import Image
+
+# Masks are kept per (width, height, falloff, strength); batches from one
+# camera share dimensions, so a run usually computes a single mask.
+VIGNETTE_CACHE_SIZE = 8
+
+# Falloff curves map the normalised distance from the centre (0 at the
+# centre, 1 at the corners) to the amount of darkening before strength.
+FALLOFF_CURVES = {
+    "linear": lambda d: d,
+    "quadratic": lambda d: d * d,
+    "cubic": lambda d: d * d * d,
+    "smoothstep": lambda d: d * d * (3 - 2 * d),
+    "sqrt": np.sqrt,
+}
+
+def _falloff_curve(falloff):
+    if isinstance(falloff, str):
+        if falloff not in FALLOFF_CURVES:
+            raise ValueError(f"Unknown vignette falloff '{falloff}'")
+        return FALLOFF_CURVES[falloff]
+    # A numeric falloff is used as an exponent on the distance
+    return lambda d: d ** float(falloff)
+
+@lru_cache(maxsize=VIGNETTE_CACHE_SIZE)
+def vignette_mask(width, height, falloff="linear", strength=1.0):
+    """
+    Build a radial vignette mask in closed form.
+
+    :param width: Mask width in pixels.
+    :param height: Mask height in pixels.
+    :param falloff: Name from FALLOFF_CURVES or a numeric exponent.
+    :param strength: Amount of darkening at the corners (0.0 to 1.0).
+    :return: Cached 'L' mode image, 255 at the centre; do not modify it in place.
+    """
+    curve = _falloff_curve(falloff)
+    dx = np.arange(width, dtype=np.float64) - width / 2
+    dy = np.arange(height, dtype=np.float64)[:, None] - height / 2
+    # Distance normalised to 0..1, then inverted and scaled to 0..255
+    d = np.sqrt(dx * dx + dy * dy) / (np.sqrt(width * width + height * height) / 2)
+    mask = (1 - strength * curve(d)) * 255
+    np.clip(mask, 0, 255, out=mask)
+    return Image.fromarray(mask.astype(np.uint8))
+
+def apply_vignette(image, falloff="linear", strength=1.0):
+    """
+    Darken the edges of an image with a cached radial vignette.
+
+    The image is composited over a grey copy of the mask, so the corners fade
+    towards black as the mask does.
+
+    :param image: PIL Image object.
+    :param falloff: Name from FALLOFF_CURVES or a numeric exponent.
+    :param strength: Amount of darkening at the corners (0.0 to 1.0).
+    :return: Image with the vignette applied.
+    """
+    mask = vignette_mask(image.size[0], image.size[1], falloff, strength)
+    shade = Image.merge("RGB", (mask, mask, mask))
+    if shade.mode != image.mode:
+        shade = shade.convert(image.mode)
+    return Image.composite(image, shade, mask)
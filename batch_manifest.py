@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_NAME = ".manifest.sqlite"
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Hash the content of a file.
+
+    :param path: Path to the file.
+    :param chunk_size: Bytes read per chunk.
+    :return: Hex digest of the file content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BatchManifest:
+    """
+    Record of finished batch outputs, used to skip unchanged work on reruns
+    and to resume interrupted runs.
+
+    Each row stores the input's content hash, the effect chain, the render
+    parameters and the output path. A row is written only after the output
+    file has been atomically saved, so a killed run never marks a partial
+    file as done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            "input TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, content_hash TEXT, "
+            "chain TEXT, params TEXT, output TEXT, finished REAL)"
+        )
+        self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def lookup(self, input_path):
+        """
+        :return: Dict of the recorded row for an input, or None.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, content_hash, chain, params, output FROM outputs WHERE input = ?",
+                (input_path,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("size", "mtime_ns", "content_hash", "chain", "params", "output"), row))
+
+    def outputs(self):
+        """
+        :return: Set of every output path in the manifest.
+        """
+        with self._lock:
+            return {row[0] for row in self._connection.execute("SELECT output FROM outputs")}
+
+    def fingerprint(self, input_path):
+        """
+        Identify an input's content, reusing the recorded hash when the file's
+        size and modification time have not changed.
+
+        :return: Tuple of (size, mtime_ns, content hash).
+        """
+        stat = os.stat(input_path)
+        record = self.lookup(input_path)
+        if record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+            return stat.st_size, stat.st_mtime_ns, record["content_hash"]
+        return stat.st_size, stat.st_mtime_ns, file_digest(input_path)
+
+    def is_done(self, input_path, fingerprint, chain, params):
+        """
+        Check whether an input was already processed with the same content,
+        chain and parameters, and its output still exists.
+        """
+        record = self.lookup(input_path)
+        return (
+            record is not None
+            and record["content_hash"] == fingerprint[2]
+            and record["chain"] == json.dumps(list(chain))
+            and record["params"] == json.dumps(params, sort_keys=True)
+            and os.path.exists(record["output"])
+        )
+
+    def record(self, input_path, fingerprint, chain, params, output_path):
+        """
+        Mark an input as done; call only after its output has been saved.
+        """
+        size, mtime_ns, content_hash = fingerprint
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (input_path, size, mtime_ns, content_hash, json.dumps(list(chain)),
+                 json.dumps(params, sort_keys=True), output_path, time.time()),
+            )
+            self._connection.commit()
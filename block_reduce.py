@@ -0,0 +1,172 @@
+import numpy as np
+from PIL import Image
+
+def _as_3d(arr):
+    return arr[:, :, None] if arr.ndim == 2 else arr
+
+def block_edges(length, block):
+    """
+    Edges of fixed-size blocks along one axis; the last block may be smaller.
+
+    :param length: Axis length in pixels.
+    :param block: Block size in pixels.
+    :return: Int array of block edges, from 0 to length.
+    """
+    return np.append(np.arange(0, length, max(1, int(block))), length)
+
+def grid_edges(length, count):
+    """
+    Edges of a fixed number of blocks along one axis. Sizes differ by at most
+    one pixel, the remainder being spread across the blocks.
+
+    :param length: Axis length in pixels.
+    :param count: Number of blocks; at most one block per pixel is made.
+    :return: Int array of block edges, from 0 to length.
+    """
+    count = max(1, min(int(count), length))
+    return np.arange(count + 1) * length // count
+
+def _gather_index(edges):
+    # Per-block pixel indices padded to the longest block, and which are real
+    sizes = np.diff(edges)
+    offsets = np.arange(sizes.max())
+    valid = offsets < sizes[:, None]
+    return np.where(valid, edges[:-1, None] + offsets, 0), valid
+
+def _padded_blocks(arr, row_edges, col_edges, fill):
+    """
+    Gather an (H, W, C) array into (grid_h, grid_w, longest block, C), with
+    fill in place of the pixels smaller blocks lack.
+    """
+    rows, row_valid = _gather_index(row_edges)
+    cols, col_valid = _gather_index(col_edges)
+    blocks = arr[rows[:, :, None, None], cols[None, None, :, :]]
+    valid = row_valid[:, :, None, None] & col_valid[None, None, :, :]
+    blocks = np.where(valid[..., None], blocks, np.asarray(fill, dtype=arr.dtype))
+    grid_h, block_h, grid_w, block_w, channels = blocks.shape
+    return blocks.transpose(0, 2, 1, 3, 4).reshape(grid_h, grid_w, block_h * block_w, channels)
+
+def _block_mean(arr, row_edges, col_edges):
+    # reduceat sums blocks of any size without padding
+    sums = np.add.reduceat(np.add.reduceat(arr, row_edges[:-1], axis=0, dtype=np.float64), col_edges[:-1], axis=1)
+    counts = np.diff(row_edges)[:, None] * np.diff(col_edges)[None, :]
+    return sums / counts[:, :, None]
+
+def _block_median(arr, row_edges, col_edges):
+    blocks = _padded_blocks(arr.astype(np.float32), row_edges, col_edges, np.nan)
+    # Sorting puts the NaN padding last, so each block's middle values sit at
+    # positions given by its own pixel count
+    blocks.sort(axis=2)
+    counts = (np.diff(row_edges)[:, None] * np.diff(col_edges)[None, :])[:, :, None, None]
+    lower = np.take_along_axis(blocks, (counts - 1) // 2, axis=2)[:, :, 0]
+    upper = np.take_along_axis(blocks, counts // 2, axis=2)[:, :, 0]
+    return (lower + upper) / 2
+
+def _block_mode(arr, row_edges, col_edges):
+    channels = arr.shape[2]
+    # Pack each color into one integer so the mode is taken over whole colors
+    packed = np.zeros(arr.shape[:2], dtype=np.int64)
+    for c in range(channels):
+        packed = (packed << 8) | arr[:, :, c]
+    blocks = _padded_blocks(packed[:, :, None], row_edges, col_edges, -1)[..., 0]
+    grid_h, grid_w, size = blocks.shape
+    ordered = np.sort(blocks.reshape(-1, size), axis=1)
+
+    # Length of the run of equal values ending at each position
+    index = np.broadcast_to(np.arange(size), ordered.shape)
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    run_start = np.maximum.accumulate(np.where(starts, index, 0), axis=1)
+    run_length = index - run_start + 1
+    run_length[ordered < 0] = 0  # ignore padding
+
+    winner = ordered[np.arange(len(ordered)), run_length.argmax(axis=1)]
+    colors = np.empty((len(winner), channels), dtype=np.float64)
+    for c in reversed(range(channels)):
+        colors[:, c] = winner & 0xFF
+        winner = winner >> 8
+    return colors.reshape(grid_h, grid_w, channels)
+
+BLOCK_REDUCERS = {
+    "mean": _block_mean,
+    "median": _block_median,
+    "mode": _block_mode,
+}
+
+def block_reduce(arr, block_h, block_w, method="mean"):
+    """
+    Reduce an image array to one value per block.
+
+    Blocks on the right and bottom edges may be smaller than the block size;
+    they are reduced over the pixels they actually cover.
+
+    :param arr: NumPy array of shape (H, W) or (H, W, C).
+    :param block_h: Block height in pixels.
+    :param block_w: Block width in pixels.
+    :param method: One of BLOCK_REDUCERS ('mean', 'median' or 'mode').
+    :return: Float array of shape (ceil(H / block_h), ceil(W / block_w), C).
+    """
+    arr = np.asarray(arr)
+    return reduce_blocks(arr, block_edges(arr.shape[0], block_h), block_edges(arr.shape[1], block_w), method)
+
+def reduce_blocks(arr, row_edges, col_edges, method="mean"):
+    """
+    Reduce an image array to one value per block, for blocks of any sizes.
+
+    :param arr: NumPy array of shape (H, W) or (H, W, C).
+    :param row_edges: Block edges along the height, from block_edges or grid_edges.
+    :param col_edges: Block edges along the width.
+    :param method: One of BLOCK_REDUCERS ('mean', 'median' or 'mode').
+    :return: Float array of shape (len(row_edges) - 1, len(col_edges) - 1, C).
+    """
+    if method not in BLOCK_REDUCERS:
+        raise ValueError(f"Unknown block reduction '{method}'")
+    return BLOCK_REDUCERS[method](_as_3d(np.asarray(arr)), np.asarray(row_edges), np.asarray(col_edges))
+
+def block_expand(blocks, block_h, block_w, height, width):
+    """
+    Expand per-block values back to full size with nearest-neighbour repetition.
+
+    :param blocks: Array of shape (grid_h, grid_w, C).
+    :param block_h: Block height in pixels.
+    :param block_w: Block width in pixels.
+    :param height: Output height; the expanded array is cropped to it.
+    :param width: Output width; the expanded array is cropped to it.
+    :return: Array of shape (height, width, C).
+    """
+    expanded = np.repeat(np.repeat(blocks, block_h, axis=0), block_w, axis=1)
+    return expanded[:height, :width]
+
+def expand_blocks(blocks, row_edges, col_edges):
+    """
+    Expand per-block values back to full size, each block to its own size.
+
+    :param blocks: Array of shape (len(row_edges) - 1, len(col_edges) - 1, C).
+    :param row_edges: Block edges along the height.
+    :param col_edges: Block edges along the width.
+    :return: Array of shape (row_edges[-1], col_edges[-1], C).
+    """
+    return np.repeat(np.repeat(blocks, np.diff(row_edges), axis=0), np.diff(col_edges), axis=1)
+
+def pixelate(image, block_size=25, block_pixels=None, method="mean"):
+    """
+    Replace each block of the image with its reduced color.
+
+    :param image: PIL Image object.
+    :param block_size: Number of blocks across each axis when block_pixels is
+                       not given; block sizes differ by at most one pixel.
+    :param block_pixels: Side of square blocks in pixels; overrides block_size.
+    :param method: Block reduction, one of BLOCK_REDUCERS.
+    :return: Pixelated image covering the full frame.
+    """
+    width, height = image.size
+    if block_pixels:
+        row_edges, col_edges = block_edges(height, block_pixels), block_edges(width, block_pixels)
+    else:
+        row_edges, col_edges = grid_edges(height, block_size), grid_edges(width, block_size)
+    arr = np.asarray(image)
+    blocks = np.rint(reduce_blocks(arr, row_edges, col_edges, method)).astype(np.uint8)
+    output = expand_blocks(blocks, row_edges, col_edges)
+    if arr.ndim == 2:
+        output = output[:, :, 0]
+    return Image.fromarray(np.ascontiguousarray(output))
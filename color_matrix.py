@@ -0,0 +1,93 @@
+import numpy as np
+from PIL import Image
+
+# Rows are output channels (R, G, B); columns are the input R, G, B weights
+# followed by a constant offset.
+SEPIA_MATRIX = (
+    (0.393, 0.769, 0.189, 0.0),
+    (0.349, 0.686, 0.168, 0.0),
+    (0.272, 0.534, 0.131, 0.0),
+)
+
+GOLDEN_TINT_MATRIX = (
+    (0.3588, 0.7044, 0.1368, 0.0),
+    (0.299, 0.587, 0.114, 0.0),
+    (0.2392, 0.4696, 0.0912, 0.0),
+)
+
+# Number of pixels converted per pass, bounds the float64 scratch buffers.
+CHUNK_PIXELS = 1 << 20
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+def scale_matrix(r_factor=1.0, g_factor=1.0, b_factor=1.0):
+    """
+    Build a diagonal color matrix that scales each channel independently.
+
+    :param r_factor: Multiplier for the red channel.
+    :param g_factor: Multiplier for the green channel.
+    :param b_factor: Multiplier for the blue channel.
+    :return: 3x4 color matrix.
+    """
+    return (
+        (r_factor, 0.0, 0.0, 0.0),
+        (0.0, g_factor, 0.0, 0.0),
+        (0.0, 0.0, b_factor, 0.0),
+    )
+
+def as_affine(matrix):
+    """
+    Normalise a 3x3 or 3x4 color matrix to a 3x4 float64 array.
+
+    :param matrix: Nested sequence of 3 rows with 3 or 4 coefficients each.
+    :return: NumPy array of shape (3, 4).
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.shape == (3, 3):
+        matrix = np.hstack([matrix, np.zeros((3, 1))])
+    if matrix.shape != (3, 4):
+        raise ValueError(f"Color matrix must be 3x3 or 3x4, got {matrix.shape}")
+    return matrix
+
+def apply_color_matrix(image, matrix):
+    """
+    Apply an affine color matrix to every pixel of an image.
+
+    Each output channel is computed as ``m0 * r + m1 * g + m2 * b + offset``,
+    truncated to an integer and saturated to the 0..255 range, which matches
+    the per-pixel ``int()`` / ``min(..., 255)`` formulas the filters used to
+    evaluate in Python loops.
+
+    :param image: PIL Image object (RGB or RGBA; other modes are converted to RGB).
+    :param matrix: 3x3 or 3x4 color matrix, see ``as_affine``.
+    :return: New image with the matrix applied; alpha is preserved.
+    """
+    matrix = as_affine(matrix)
+    alpha = None
+    if image.mode == 'RGBA':
+        alpha = image.getchannel('A')
+        image = image.convert('RGB')
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    src = np.asarray(image).reshape(-1, 3)
+    out = np.empty_like(src)
+    # Per-channel term tables: weight * level for every possible 8-bit level,
+    # so each pixel costs three lookups and two adds per output channel.
+    tables = [[matrix[c, k] * _LEVELS for k in range(3)] for c in range(3)]
+
+    for start in range(0, len(src), CHUNK_PIXELS):
+        chunk = src[start:start + CHUNK_PIXELS]
+        for c in range(3):
+            acc = tables[c][0][chunk[:, 0]]
+            acc += tables[c][1][chunk[:, 1]]
+            acc += tables[c][2][chunk[:, 2]]
+            if matrix[c, 3]:
+                acc += matrix[c, 3]
+            np.clip(acc, 0, 255, out=acc)
+            out[start:start + CHUNK_PIXELS, c] = acc
+
+    result = Image.fromarray(out.reshape(image.size[1], image.size[0], 3))
+    if alpha is not None:
+        result.putalpha(alpha)
+    return result
@@ -1,11 +1,48 @@
 import os
+import jobs
 
 class Config:
     UPLOAD_FOLDER = 'uploads/'
     PROCESSED_FOLDER = 'processed/'
     ALLOWED_EXTENSIONS = {'jpeg', 'jpg', 'png'}
     SECRET_KEY = 'supersecretkey'
+    # Effects are previewed on a copy of the upload with this long edge;
+    # the full resolution is only rendered when the result is saved
+    PROXY_FOLDER = 'proxies/'
+    PROXY_SIZE = 1280
+    # Images with at least this many pixels are split into tiles processed on all cores
+    PARALLEL_MIN_PIXELS = 4_000_000
+    PARALLEL_WORKERS = os.cpu_count() or 1
+    # Encoding profiles (see encoding.ENCODING_PROFILES) for the on-page
+    # preview and for saved results; the byte budgets apply to lossy formats
+    PREVIEW_PROFILE = 'preview'
+    PREVIEW_MAX_BYTES = None
+    FINAL_PROFILE = 'final'
+    FINAL_MAX_BYTES = None
+    # Effects run on a background job queue (see jobs.JOB_BACKENDS); at most
+    # JOB_QUEUE_DEPTH jobs wait for the JOB_WORKERS threads, and a job running
+    # longer than JOB_TIMEOUT seconds is abandoned
+    JOB_BACKEND = 'local'
+    JOB_WORKERS = 2
+    JOB_QUEUE_DEPTH = 16
+    JOB_TIMEOUT = 120
+    JOB_HISTORY = 256
+    # Encoded results are cached by input content, effect, parameters and
+    # encoding profile on disk within RESULT_CACHE_MAX_BYTES, the most
+    # recently used ones also in memory; None disables the cache
+    RESULT_CACHE_FOLDER = 'result_cache/'
+    RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    RESULT_CACHE_MEMORY_BYTES = 64 * 1024 * 1024
+    # Decoded uploads are kept in memory within this many bytes of pixels,
+    # so applying several effects decodes the image once; None disables it
+    DECODED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    # Decoded pixels are also written to memory-mapped files shared by all
+    # worker processes, deleted after MAPPED_STORE_TTL seconds unused or
+    # when the folder exceeds MAPPED_STORE_MAX_BYTES; None disables it
+    MAPPED_STORE_FOLDER = 'decoded_store/'
+    MAPPED_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+    MAPPED_STORE_TTL = 3600
 
     @staticmethod
     def init_app(app):
-        pass
+        jobs.get_job_queue(app)
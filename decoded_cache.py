@@ -0,0 +1,122 @@
+from collections import OrderedDict
+import os
+import threading
+from PIL import Image
+import mapped_store
+
+# Bytes per pixel of Pillow's in-memory storage; multi-band 8-bit images
+# are padded to four bytes a pixel.
+STORAGE_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2}
+
+def image_nbytes(image):
+    """
+    :return: Bytes of memory holding the pixels of a decoded image.
+    """
+    return image.size[0] * image.size[1] * STORAGE_BYTES.get(image.mode, 4)
+
+def decode(path):
+    """
+    :return: Fully decoded PIL Image object of a file.
+    """
+    image = Image.open(path)
+    image.load()
+    return image
+
+def _handout(image):
+    # New Image object over the same pixel storage. Marked read-only, Pillow
+    # copies the pixels before any in-place change (paste, putpixel,
+    # ImageDraw...), so the cached image is never written to
+    view = image._new(image.im)
+    view.readonly = 1
+    return view
+
+class DecodedImageCache:
+    """
+    Least recently used cache of decoded images, bounded by the memory their
+    pixels take rather than by entry count.
+
+    Entries are keyed by path and checked against the file's modification
+    time and size, so a replaced file is decoded again. Images are handed out
+    copy-on-write and can be modified freely by the caller.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024, loader=decode):
+        """
+        :param max_bytes: Maximum total size of the cached pixels.
+        :param loader: Function returning the loaded image of a path on a miss.
+        """
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _drop(self, path):
+        # Called with the lock held
+        _, _, nbytes = self._entries.pop(path)
+        self._size -= nbytes
+
+    def get(self, path):
+        """
+        Decode an image, or reuse a cached decode of it.
+
+        :param path: Image file path.
+        :return: PIL Image object sharing the cached pixels until it is modified.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self._stats["hits"] += 1
+                return _handout(entry[1])
+            if entry is not None:
+                self._drop(path)
+            self._stats["misses"] += 1
+
+        image = self.loader(path)
+        nbytes = image_nbytes(image)
+        if nbytes > self.max_bytes:
+            return image
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+            self._entries[path] = (signature, image, nbytes)
+            self._size += nbytes
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return _handout(image)
+
+    def invalidate(self, *paths):
+        """
+        Forget the decoded images of some files.
+
+        :param paths: Image file paths.
+        """
+        with self._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                if path in self._entries:
+                    self._drop(path)
+
+    def stats(self):
+        """
+        :return: Dict of hits, misses, evictions, entries and bytes used.
+        """
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._size}
+
+def get_decoded_cache(app):
+    """
+    :param app: Flask app.
+    :return: The app's decoded image cache, created from its config on first use.
+    """
+    if "decoded_cache" not in app.extensions:
+        loader = decode
+        if app.config.get("MAPPED_STORE_FOLDER"):
+            loader = mapped_store.get_mapped_store(app).get
+        app.extensions.setdefault("decoded_cache", DecodedImageCache(app.config["DECODED_CACHE_MAX_BYTES"], loader))
+    return app.extensions["decoded_cache"]
@@ -1,6 +1,7 @@
 # file_handling.py
 from tkinter import filedialog
 from PIL import Image
+import encoding
 
 def open_image(input_frame, update_output_image_callback):
     file_path = filedialog.askopenfilename()
@@ -15,4 +16,4 @@ def save_image(output_image):
     if output_image:
         save_path = filedialog.asksaveasfilename(defaultextension=".jpg", filetypes=[("JPEG files", "*.jpg"), ("PNG files", "*.png"), ("All files", "*.*")])
         if save_path:
-            output_image.save(save_path)
+            encoding.save_image(output_image, save_path, "final")
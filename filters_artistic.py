@@ -1,6 +1,14 @@
+import math
 from PIL import Image, ImageOps, ImageFilter, ImageEnhance
 import numpy as np
-
+from color_matrix import apply_color_matrix, GOLDEN_TINT_MATRIX
+from vignette import apply_vignette
+from block_reduce import pixelate
+from effect_traits import pointwise, resolution_independent, pixel_params, neighbourhood, two_pass
+from tiling import contrast_lut, contrast_tile, autocontrast_lut, remap_histogram, grayscale_histogram
+from point_luts import apply_lut, VINTAGE_LUT, FILM_LUT
+
+@pointwise
 def rosy_spectacle_filter(image, tint_color=(255, 182, 193), intensity=0.5):
     """
     Apply a rosy spectacle tint to an image.
@@ -18,6 +26,19 @@ def rosy_spectacle_filter(image, tint_color=(255, 182, 193), intensity=0.5):
     
     return tinted_image
 
+def _studio_lut(histograms):
+    # Contrast and autocontrast both derive from the gray histogram, so the
+    # whole filter collapses into one lookup table on the grayscale image
+    histogram = sum(histograms)
+    contrast = contrast_lut(histogram, 2.0)
+    stretch = autocontrast_lut(remap_histogram(histogram, contrast), cutoff=10)
+    return [stretch[level] for level in contrast]
+
+def _studio_tile(tile, lut):
+    return ImageOps.grayscale(tile).point(lut)
+
+@resolution_independent
+@two_pass(grayscale_histogram, _studio_tile, merge=_studio_lut)
 def Studio_filter(image):
     """
     Apply a high-contrast black and white filter to an image to mimic the style
@@ -35,6 +56,17 @@ def Studio_filter(image):
     
     return bw_image
 
+def _hdr_histogram(tile, box):
+    return grayscale_histogram(tile.filter(ImageFilter.DETAIL), box)
+
+def _hdr_tile(tile, histogram):
+    image = tile.filter(ImageFilter.DETAIL)
+    image = contrast_tile(image, histogram, 1.5)
+    image = ImageEnhance.Sharpness(image).enhance(2.0)
+    return ImageEnhance.Brightness(image).enhance(1.1)
+
+@neighbourhood(2)
+@two_pass(_hdr_histogram, _hdr_tile)
 def hdr_filter(image):
     # Step 1: Increase local contrast
     image = image.filter(ImageFilter.DETAIL)
@@ -53,58 +85,28 @@ def hdr_filter(image):
 
     return image
 
-def xpro2_filter(image, **kwargs):
-    width, height = image.size
-    pixels = image.load()  # create the pixel map
-
+@pixel_params("blur_radius")
+def xpro2_filter(image, blur_radius=2, **kwargs):
     # Apply golden tint (similar to sepia, but more golden)
-    for py in range(height):
-        for px in range(width):
-            r, g, b = image.getpixel((px, py))
-
-            tr = int(0.3588 * r + 0.7044 * g + 0.1368 * b)
-            tg = int(0.299 * r + 0.587 * g + 0.114 * b)
-            tb = int(0.2392 * r + 0.4696 * g + 0.0912 * b)
-
-            if tr > 255:
-                tr = 255
-
-            if tg > 255:
-                tg = 255
-
-            if tb > 255:
-                tb = 255
-
-            pixels[px, py] = (tr, tg, tb)
+    image = apply_color_matrix(image, GOLDEN_TINT_MATRIX)
 
     # Increase contrast
     enhancer = ImageEnhance.Contrast(image)
     image = enhancer.enhance(1.5)
 
     # Apply vignette effect
-    vignette = Image.new('L', (width, height), 0)
-    for x in range(width):
-        for y in range(height):
-            # Distance to the center
-            dx = x - width / 2
-            dy = y - height / 2
-            # Distance normalized to 0..1, then inverted and scaled to 0..255
-            d = np.sqrt(dx*dx + dy*dy) / (np.sqrt(width*width + height*height) / 2)
-            vignette.putpixel((x, y), int((1 - d) * 255))
-    image = Image.composite(image, ImageOps.colorize(vignette, (0, 0, 0), (255, 255, 255)), vignette)
+    image = apply_vignette(image)
 
     # Apply blur to vignette
-    image = image.filter(ImageFilter.GaussianBlur(radius=2))
+    image = image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
 
     return image
 
+@pointwise
 def vintage_filter_1(image):
-    r, g, b = image.split()
-    r = r.point(lambda i: i * 1.1)
-    g = g.point(lambda i: i * 1.1)
-    b = b.point(lambda i: i * 0.9)
-    return Image.merge("RGB", (r, g, b))
+    return apply_lut(image, VINTAGE_LUT)
 
+@resolution_independent
 def vintage_filter_2(image):
     # Step 1: Reduce saturation to create a faded look
     image = ImageEnhance.Color(image).enhance(0.5)
@@ -113,53 +115,26 @@ def vintage_filter_2(image):
     image = ImageEnhance.Contrast(image).enhance(0.9)
     
     # Step 3: Apply a warm tint
-    r, g, b = image.split()
-    r = r.point(lambda i: i * 1.2)
-    g = g.point(lambda i: i * 1.1)
-    b = b.point(lambda i: i * 0.9)
-    image = Image.merge("RGB", (r, g, b))
+    image = apply_lut(image, FILM_LUT)
     
     # Step 4: Add a slight vignette effect
-    width, height = image.size
-    vignette = Image.new('L', (width, height), 0)
-    for x in range(width):
-        for y in range(height):
-            # Distance to the center
-            dx = x - width / 2
-            dy = y - height / 2
-            # Distance normalized to 0..1, then inverted and scaled to 0..255
-            d = np.sqrt(dx*dx + dy*dy) / (np.sqrt(width*width + height*height) / 2)
-            vignette.putpixel((x, y), int((1 - d) * 255))
-    image = Image.composite(image, ImageOps.colorize(vignette, (0, 0, 0), (255, 255, 255)), vignette)
+    image = apply_vignette(image)
     
     return image
 
+@pixel_params("blur_radius")
+@neighbourhood(lambda params: 3 * params["blur_radius"] + 1)
 def acrylic_overlay_effect(image, blur_radius=10, overlay_color=(255, 255, 255, 128)):
     blurred_image = image.filter(ImageFilter.GaussianBlur(blur_radius))
     overlay = Image.new("RGBA", image.size, overlay_color)
     combined = Image.alpha_composite(blurred_image.convert("RGBA"), overlay)
     return combined.convert("RGB")
 
-def mosaic_effect(image, block_size=25):
-    small_image = image.resize((block_size, block_size), Image.LANCZOS)
-    small_pixels = np.array(small_image)
-    original_width, original_height = image.size
-    output_image = Image.new("RGB", image.size)
-    output_pixels = np.array(output_image)
-    block_width = original_width // block_size
-    block_height = original_height // block_size
-    for i in range(block_size):
-        for j in range(block_size):
-            tile_color = small_pixels[j, i]
-            x_start = i * block_width
-            y_start = j * block_height
-            x_end = x_start + block_width
-            y_end = y_start + block_height
-            for x in range(x_start, min(x_end, original_width)):
-                for y in range(y_start, min(y_end, original_height)):
-                    output_pixels[y, x] = tile_color
-    return Image.fromarray(output_pixels)
+@pixel_params("block_pixels")
+def mosaic_effect(image, block_size=25, block_pixels=None, method="mean"):
+    return pixelate(image, block_size, block_pixels, method)
 
+@neighbourhood(1)
 def outline_drawing(image):
     # Apply edge detection filter
     edges_image = image.filter(ImageFilter.FIND_EDGES)
@@ -168,11 +143,14 @@ def outline_drawing(image):
     grayscale_image = inverted_image.convert("L")
     return grayscale_image
 
-def sketch_effect(image):
+@pixel_params("blur_radius")
+@neighbourhood(lambda params: 3 * params["blur_radius"] + 1)
+def sketch_effect(image, blur_radius=10):
     """
     Apply a sketch effect to the image.
     
     :param image: The original image.
+    :param blur_radius: Radius of the blur that softens the strokes, in pixels.
     :return: The image with a sketch effect.
     """
     # Convert the image to grayscale
@@ -182,22 +160,25 @@ def sketch_effect(image):
     inverted_image = ImageOps.invert(gray_image)
     
     # Apply a blur to the inverted image
-    blurred_image = inverted_image.filter(ImageFilter.GaussianBlur(radius=10))
+    blurred_image = inverted_image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
     
     # Blend the grayscale image with the blurred inverted image
     sketch_image = Image.blend(gray_image, blurred_image, alpha=0.5)
     
     return sketch_image
 
-def oil_painting_effect(image):
+@pixel_params("median_size")
+@neighbourhood(lambda params: params["median_size"] // 2)
+def oil_painting_effect(image, median_size=3):
     """
     Apply an oil painting effect to the image.
     
     :param image: The original image.
+    :param median_size: Side of the median filter, in pixels; rounded up to odd.
     :return: The image with an oil painting effect.
     """
-    # Apply a median filter to smooth the image
-    smoothed_image = image.filter(ImageFilter.MedianFilter(size=3))
+    # Apply a median filter to smooth the image; Pillow rejects a 1 pixel one
+    smoothed_image = image.filter(ImageFilter.MedianFilter(size=median_size | 1)) if median_size > 1 else image
     
     # Enhance the color
     enhancer = ImageEnhance.Color(smoothed_image)
@@ -205,26 +186,32 @@ def oil_painting_effect(image):
     
     return enhanced_image
 
-def watercolor_effect(image):
+@pixel_params("blur_radius")
+@neighbourhood(lambda params: math.ceil(3 * params["blur_radius"]) + 2)
+def watercolor_effect(image, blur_radius=2.0):
     """
     Apply a watercolor effect to the image.
     
     :param image: The original image.
+    :param blur_radius: Radius of the smoothing blur, in pixels.
     :return: The image with a watercolor effect.
     """
     # Apply a Gaussian blur to smooth the image
-    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=2))
+    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
     
     # Apply an edge enhancement filter
     enhanced_image = blurred_image.filter(ImageFilter.EDGE_ENHANCE_MORE)
     
     return enhanced_image
 
-def cartoon_effect(image):
+@pixel_params("blur_radius")
+@neighbourhood(lambda params: math.ceil(3 * params["blur_radius"]) + 2)
+def cartoon_effect(image, blur_radius=1.0):
     """
     Apply a cartoon effect to the image.
     
     :param image: The original image.
+    :param blur_radius: Radius of the blur that smooths the edges, in pixels.
     :return: The image with a cartoon effect.
     """
     # Convert the image to grayscale
@@ -237,7 +224,7 @@ def cartoon_effect(image):
     inverted_edges = ImageOps.invert(edges)
     
     # Blur the edges to make them look smoother
-    blurred_edges = inverted_edges.filter(ImageFilter.GaussianBlur(radius=1))
+    blurred_edges = inverted_edges.filter(ImageFilter.GaussianBlur(radius=blur_radius))
     
     # Enhance the edges by blending with the original image
     cartoon_image = Image.blend(image, blurred_edges.convert("RGB"), alpha=0.3)
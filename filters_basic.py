@@ -1,69 +1,70 @@
 from PIL import Image, ImageOps, ImageEnhance, ImageFilter
+from color_matrix import apply_color_matrix, SEPIA_MATRIX
+from effect_traits import pointwise, resolution_independent, neighbourhood, two_pass
+from tiling import contrast_tile, grayscale_histogram
+from quantize import quantize
+from point_luts import apply_lut, apply_channel_scale, scaled_factor, COOL_LUT, WARM_LUT
 
+@pointwise
 def sepia_filter(image):
-    width, height = image.size
-    pixels = image.load()
-    for py in range(height):
-        for px in range(width):
-            r, g, b = image.getpixel((px, py))
-            tr = int(0.393 * r + 0.769 * g + 0.189 * b)
-            tg = int(0.349 * r + 0.686 * g + 0.168 * b)
-            tb = int(0.272 * r + 0.534 * g + 0.131 * b)
-
-            if tr > 255:
-                tr = 255
-
-            if tg > 255:
-                tg = 255
-
-            if tb > 255:
-                tb = 255
-            pixels[px, py] = (tr, tg, tb)
-
-    return image
+    return apply_color_matrix(image, SEPIA_MATRIX)
 
+@pointwise
 def raw_image(image):
     return image
 
+@pointwise
 def grayscale_filter(image):
     return image.convert("L")
 
+@pointwise
 def invert_filter(image):
     return ImageOps.invert(image)
 
+@pointwise
 def brightness_filter(image, factor=1.5):
     enhancer = ImageEnhance.Brightness(image)
     return enhancer.enhance(factor)
 
+@resolution_independent
+@two_pass(grayscale_histogram, contrast_tile)
 def contrast_filter(image, factor=1.5):
     enhancer = ImageEnhance.Contrast(image)
     return enhancer.enhance(factor)
 
+@neighbourhood(1)
 def sharpen_filter(image):
     enhancer = ImageEnhance.Sharpness(image)
     return enhancer.enhance(2.0)
 
+@neighbourhood(1)
 def edge_filter(image):
     return image.filter(ImageFilter.FIND_EDGES)
 
+@neighbourhood(1)
 def emboss_filter(image):
     return image.filter(ImageFilter.EMBOSS)
 
-def posterize_image(image, levels=4):
+@resolution_independent
+def posterize_image(image, levels=4, palette_colors=None, dither=False):
+    if palette_colors:
+        # Adaptive posterize: reduce to a fitted palette instead of fixed bit depth
+        quantized, _ = quantize(image, min(256, palette_colors), dither=dither)
+        return quantized.convert("RGB")
     levels = max(2, min(256, levels))
     return ImageOps.posterize(image, 8 - levels.bit_length())
 
-def cool_filter(image):
-    r, g, b = image.split()
-    r = r.point(lambda i: i * 0.9)
-    b = b.point(lambda i: i * 1.2)
-    return Image.merge("RGB", (r, g, b))
-
-def warm_filter(image):
-    r, g, b = image.split()
-    r = r.point(lambda i: i * 1.2)
-    b = b.point(lambda i: i * 0.9)
-    return Image.merge("RGB", (r, g, b))
+@pointwise
+def cool_filter(image, strength=1.0):
+    if strength == 1:
+        return apply_lut(image, COOL_LUT)
+    return apply_channel_scale(image, scaled_factor(0.9, strength), 1.0, scaled_factor(1.2, strength))
+
+@pointwise
+def warm_filter(image, strength=1.0):
+    if strength == 1:
+        return apply_lut(image, WARM_LUT)
+    return apply_channel_scale(image, scaled_factor(1.2, strength), 1.0, scaled_factor(0.9, strength))
 
 # Export effects
 basic_effects = {
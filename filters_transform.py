@@ -1,5 +1,66 @@
+from collections import OrderedDict
+import hashlib
+import threading
 from PIL import Image, ImageOps
 import numpy as np
+from quantize import quantize, downsample, map_to_palette
+from effect_traits import resolution_independent, global_stats
+
+# Quantized images are kept per (content hash, num_colors) so clicking
+# through several tr_* effects on one upload quantizes it only once.
+PALETTE_CACHE_SIZE = 8
+_palette_cache = OrderedDict()
+# Effects run on tiling threads and web job workers at once
+_palette_lock = threading.Lock()
+
+def image_digest(image):
+    """
+    Hash the pixel content of an image.
+    
+    :param image: PIL Image object.
+    :return: Hex digest identifying the image mode, size and pixels.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def quantize_cached(image, num_colors=256, method="median_cut"):
+    """
+    Quantize an image to an adaptive palette, reusing earlier results.
+    
+    :param image: PIL Image object.
+    :param num_colors: Number of colors in the palette.
+    :param method: Palette fitting method, see quantize.PALETTE_METHODS.
+    :return: Tuple of (quantized "P" image, palette as an (N, 3) uint8 array).
+             Both are shared with the cache and must not be modified.
+    """
+    key = (image_digest(image), num_colors, method)
+    with _palette_lock:
+        if key in _palette_cache:
+            _palette_cache.move_to_end(key)
+            return _palette_cache[key]
+    # Quantize outside the lock so other threads are not held up
+    quantized, palette = quantize(image, num_colors, method)
+    palette.flags.writeable = False
+    with _palette_lock:
+        _palette_cache[key] = (quantized, palette)
+        _palette_cache.move_to_end(key)
+        if len(_palette_cache) > PALETTE_CACHE_SIZE:
+            _palette_cache.popitem(last=False)
+    return quantized, palette
+
+def swap_palette(quantized, palette):
+    """
+    Replace the palette of an already-quantized image.
+    
+    :param quantized: "P" mode image.
+    :param palette: (N, 3) array or list of RGB tuples, in palette index order.
+    :return: RGB image with every pixel mapped through the new palette.
+    """
+    swapped = quantized.copy()
+    swapped.putpalette(np.asarray(palette, dtype=np.uint8).ravel().tolist())
+    return swapped.convert("RGB")
 
 def extract_palette(image, num_colors=256):
     """
@@ -9,10 +70,8 @@ def extract_palette(image, num_colors=256):
     :param num_colors: Number of colors to extract for the palette.
     :return: List of palette colors.
     """
-    image = image.convert("P", palette=Image.ADAPTIVE, colors=num_colors)
-    palette = image.getpalette()
-    palette = palette[:num_colors * 3]
-    return [tuple(palette[i:i + 3]) for i in range(0, len(palette), 3)]
+    _, palette = quantize_cached(image, num_colors)
+    return [tuple(color) for color in palette.tolist()]
 
 def apply_palette(image, palette):
     """
@@ -22,128 +81,139 @@ def apply_palette(image, palette):
     :param palette: List of RGB tuples representing the new palette.
     :return: Image with the new palette applied.
     """
-    image = image.convert("RGB")
-    palette_image = Image.new("P", (1, 1))
-    flat_palette = [value for color in palette for value in color]
-    palette_image.putpalette(flat_palette + [0] * (768 - len(flat_palette)))
-    
-    # Quantize image to the new palette
-    new_image = image.quantize(palette=palette_image)
+    # Map each pixel to its nearest palette color through a lookup table
+    new_image = map_to_palette(image, np.asarray(palette, dtype=np.uint8))
     return new_image.convert("RGB")
 
 def transform_palette(palette, transform_fn):
     """
-    Apply a transformation function to each color in the palette.
+    Apply a transformation function to the whole palette at once.
     
-    :param palette: List of RGB tuples representing the palette.
-    :param transform_fn: Function to apply to each color.
-    :return: Transformed palette.
+    :param palette: (N, 3) array or list of RGB tuples representing the palette.
+    :param transform_fn: Function mapping an (N, 3) array to an (N, 3) array.
+    :return: Transformed palette as an (N, 3) uint8 array.
     """
-    return [transform_fn(color) for color in palette]
+    colors = np.asarray(palette, dtype=np.float64).reshape(-1, 3)
+    return np.asarray(transform_fn(colors)).astype(np.uint8)
 
-def lighten_transform(color):
+def lighten_transform(colors):
     """
     Example color transformation function: Increase brightness.
     
-    :param color: RGB tuple.
-    :return: Transformed RGB tuple.
+    :param colors: (N, 3) array of RGB colors.
+    :return: Transformed (N, 3) array.
     """
-    r, g, b = color
-    r = min(255, int(r * 1.5))
-    g = min(255, int(g * 1.5))
-    b = min(255, int(b * 1.5))
-    return (r, g, b)
+    return np.minimum(255, np.trunc(colors * 1.5))
 
-def darken_transform(color):
+def darken_transform(colors):
     """
     Example color transformation function: Decrease brightness.
     
-    :param color: RGB tuple.
-    :return: Transformed RGB tuple.
+    :param colors: (N, 3) array of RGB colors.
+    :return: Transformed (N, 3) array.
     """
-    r, g, b = color
-    r = max(0, int(r * 0.5))
-    g = max(0, int(g * 0.5))
-    b = max(0, int(b * 0.5))
-    return (r, g, b)
+    return np.maximum(0, np.trunc(colors * 0.5))
 
-def increase_contrast_transform(color):
+def increase_contrast_transform(colors):
     """
     Example color transformation function: Increase contrast.
     
-    :param color: RGB tuple.
-    :return: Transformed RGB tuple.
+    :param colors: (N, 3) array of RGB colors.
+    :return: Transformed (N, 3) array.
     """
     factor = 1.5
-    r, g, b = color
-    r = min(255, max(0, int(128 + factor * (r - 128))))
-    g = min(255, max(0, int(128 + factor * (g - 128))))
-    b = min(255, max(0, int(128 + factor * (b - 128))))
-    return (r, g, b)
+    return np.clip(np.trunc(128 + factor * (colors - 128)), 0, 255)
 
-def decrease_contrast_transform(color):
+def decrease_contrast_transform(colors):
     """
     Example color transformation function: Decrease contrast.
     
-    :param color: RGB tuple.
-    :return: Transformed RGB tuple.
+    :param colors: (N, 3) array of RGB colors.
+    :return: Transformed (N, 3) array.
     """
     factor = 0.5
-    r, g, b = color
-    r = min(255, max(0, int(128 + factor * (r - 128))))
-    g = min(255, max(0, int(128 + factor * (g - 128))))
-    b = min(255, max(0, int(128 + factor * (b - 128))))
-    return (r, g, b)
+    return np.clip(np.trunc(128 + factor * (colors - 128)), 0, 255)
 
-def sepia_transform(color):
+def sepia_transform(colors):
     """
     Example color transformation function: Apply sepia effect.
     
-    :param color: RGB tuple.
-    :return: Transformed RGB tuple.
-    """
-    r, g, b = color
-    tr = int(0.393 * r + 0.769 * g + 0.189 * b)
-    tg = int(0.349 * r + 0.686 * g + 0.168 * b)
-    tb = int(0.272 * r + 0.534 * g + 0.131 * b)
-    return (min(255, tr), min(255, tg), min(255, tb))
+    :param colors: (N, 3) array of RGB colors.
+    :return: Transformed (N, 3) array.
+    """
+    r, g, b = colors[:, 0], colors[:, 1], colors[:, 2]
+    tr = np.trunc(0.393 * r + 0.769 * g + 0.189 * b)
+    tg = np.trunc(0.349 * r + 0.686 * g + 0.168 * b)
+    tb = np.trunc(0.272 * r + 0.534 * g + 0.131 * b)
+    return np.minimum(255, np.stack([tr, tg, tb], axis=1))
 
-def invert_colors_transform(color):
+def invert_colors_transform(colors):
     """
     Example color transformation function: Invert colors.
     
-    :param color: RGB tuple.
-    :return: Transformed RGB tuple.
+    :param colors: (N, 3) array of RGB colors.
+    :return: Transformed (N, 3) array.
     """
-    r, g, b = color
-    return (255 - r, 255 - g, 255 - b)
+    return 255 - colors
 
 def process_image(image, transform_fn, num_colors=256):
     """
     Process an image: Extract palette, transform it, and reapply it.
     
+    The image is quantized once per content and palette size; the transformed
+    palette is then swapped directly into the quantized image.
+    
     :param image: PIL Image object.
-    :param transform_fn: Function to apply to each color in the palette.
+    :param transform_fn: Function mapping an (N, 3) palette array to a new one.
     :param num_colors: Number of colors to use in the palette.
     :return: PIL Image object with transformed palette.
     """
     # Extract the palette
-    palette = extract_palette(image, num_colors)
+    quantized, palette = quantize_cached(image, num_colors)
     
     # Transform the palette
     transformed_palette = transform_palette(palette, transform_fn)
     
-    # Apply the transformed palette to the image
-    new_image = apply_palette(image, transformed_palette)
+    # Swap the transformed palette into the quantized image
+    new_image = swap_palette(quantized, transformed_palette)
 
     return new_image
 
+def palette_effect(transform_fn, num_colors=256):
+    """
+    Build a palette transform effect with a global stats form for tiled runs:
+    the palette is fitted once, and each tile is then mapped and recolored
+    with it.
+    
+    The palette of a whole image is fitted on its downsampled copy, so
+    quantizing that copy gives the same palette, and goes through the
+    palette cache, at a fraction of the cost. Tiled and whole runs give the
+    same pixels.
+    
+    :param transform_fn: Function mapping an (N, 3) palette array to a new one.
+    :param num_colors: Number of colors to use in the palette.
+    :return: Effect function.
+    """
+    def compute(image):
+        _, palette = quantize_cached(downsample(image.convert("RGB")), num_colors)
+        return palette, transform_palette(palette, transform_fn)
+
+    def apply(tile, palettes):
+        palette, transformed_palette = palettes
+        return swap_palette(map_to_palette(tile, palette), transformed_palette)
+
+    @resolution_independent
+    @global_stats(compute, apply)
+    def effect(image):
+        return process_image(image, transform_fn, num_colors)
+    return effect
+
 # Export effects
 transform_effects = {
-    "tr_Lighten": lambda img: process_image(img, lighten_transform),
-    "tr_Darken": lambda img: process_image(img, darken_transform),
-    "tr_Increase Contrast": lambda img: process_image(img, increase_contrast_transform),
-    "tr_Decrease Contrast": lambda img: process_image(img, decrease_contrast_transform),
-    "tr_Sepia": lambda img: process_image(img, sepia_transform),
-    "tr_Invert Colors": lambda img: process_image(img, invert_colors_transform),
+    "tr_Lighten": palette_effect(lighten_transform),
+    "tr_Darken": palette_effect(darken_transform),
+    "tr_Increase Contrast": palette_effect(increase_contrast_transform),
+    "tr_Decrease Contrast": palette_effect(decrease_contrast_transform),
+    "tr_Sepia": palette_effect(sepia_transform),
+    "tr_Invert Colors": palette_effect(invert_colors_transform),
 }
@@ -0,0 +1,116 @@
+from functools import lru_cache
+import os
+import threading
+import numpy as np
+from seeding import make_rng
+
+# Side of the square grain textures, in pixels.
+TEXTURE_SIZE = 512
+
+# Independent textures per grain amplitude; every tile of an image picks one.
+TEXTURE_VARIANTS = 4
+
+# Folder to persist generated textures in; unset keeps them in memory only.
+GRAIN_BANK_DIR = os.environ.get("XIMAGE_GRAIN_BANK")
+
+def mask_sigma(pixel_count):
+    """
+    Standard deviation of a grain mask stretched to 0..255 by its extremes,
+    as generate_grain_mask has always done: the stretch depends only on the
+    expected range of that many normal draws.
+
+    :param pixel_count: Number of pixels in the mask.
+    :return: Standard deviation in 8-bit levels.
+    """
+    log_count = np.log(max(pixel_count, 2))
+    peak = np.sqrt(2 * log_count)
+    expected_max = peak - (np.log(log_count) + np.log(4 * np.pi) - 2 * np.euler_gamma) / (2 * peak)
+    return 255 / (2 * max(expected_max, 1.0))
+
+def _bank_key(sigma):
+    # Amplitudes are banked in half-level steps
+    return round(float(sigma) * 2) / 2
+
+@lru_cache(maxsize=64)
+def _texture(sigma, variant):
+    path = None
+    if GRAIN_BANK_DIR:
+        path = os.path.join(GRAIN_BANK_DIR, f"grain_{sigma:g}_{variant}.npy")
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+    rng = make_rng([int(sigma * 2), variant])
+    noise = rng.standard_normal((TEXTURE_SIZE, TEXTURE_SIZE), dtype=np.float32) * sigma
+    texture = np.rint(noise).astype(np.int16)
+    if path:
+        os.makedirs(GRAIN_BANK_DIR, exist_ok=True)
+        # Rename into place so concurrent workers never read a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as target:
+            np.save(target, texture)
+        os.replace(temp_path, path)
+    texture.flags.writeable = False
+    return texture
+
+def grain_texture(sigma, variant=0):
+    """
+    Zero-mean grain texture of a given amplitude. Grain is uncorrelated from
+    pixel to pixel, so the texture tiles seamlessly and can be shifted and
+    flipped freely.
+
+    :param sigma: Standard deviation in 8-bit levels, rounded to half a level.
+    :param variant: Index below TEXTURE_VARIANTS.
+    :return: Cached read-only int16 array of TEXTURE_SIZE x TEXTURE_SIZE.
+    """
+    return _texture(_bank_key(sigma), variant % TEXTURE_VARIANTS)
+
+def _copy_wrapped(target, texture, dy, dx):
+    # Copy a window of the texture starting at (dy, dx), wrapping around its edges
+    rows, cols = target.shape
+    size = texture.shape[0]
+    head_rows, head_cols = min(rows, size - dy), min(cols, size - dx)
+    target[:head_rows, :head_cols] = texture[dy:dy + head_rows, dx:dx + head_cols]
+    if head_cols < cols:
+        target[:head_rows, head_cols:] = texture[dy:dy + head_rows, :cols - head_cols]
+    if head_rows < rows:
+        target[head_rows:, :head_cols] = texture[:rows - head_rows, dx:dx + head_cols]
+        if head_cols < cols:
+            target[head_rows:, head_cols:] = texture[:rows - head_rows, :cols - head_cols]
+
+def grain_field(height, width, sigma, seed=None, channels=None):
+    """
+    Assemble a grain field by tiling banked textures, each tile with a
+    random variant, cyclic offset and flips, so no repetition is visible.
+
+    :param height: Field height.
+    :param width: Field width.
+    :param sigma: Standard deviation in 8-bit levels.
+    :param seed: Integer seed, numpy.random.Generator, or None.
+    :param channels: Number of independent channels, or None for a 2D field.
+    :return: int16 array of shape (height, width) or (height, width, channels).
+    """
+    rng = make_rng(seed)
+    size = TEXTURE_SIZE
+    field = np.empty((height, width) if channels is None else (height, width, channels), dtype=np.int16)
+    planes = [field] if channels is None else [field[:, :, c] for c in range(channels)]
+    for plane in planes:
+        for top in range(0, height, size):
+            for left in range(0, width, size):
+                variant, dy, dx, flip_y, flip_x = rng.integers(0, [TEXTURE_VARIANTS, size, size, 2, 2])
+                texture = grain_texture(sigma, variant)
+                texture = texture[::-1 if flip_y else 1, ::-1 if flip_x else 1]
+                _copy_wrapped(plane[top:top + size, left:left + size], texture, dy, dx)
+    return field
+
+def grain_mask(width, height, seed=None):
+    """
+    Grain mask centred on mid-gray with the amplitude generate_grain_mask
+    has always produced for an image of this size.
+
+    :param width: Mask width.
+    :param height: Mask height.
+    :param seed: Integer seed, numpy.random.Generator, or None.
+    :return: uint8 array of shape (height, width).
+    """
+    field = grain_field(height, width, mask_sigma(width * height), seed)
+    field += 127
+    return np.clip(field, 0, 255, out=field).astype(np.uint8)
@@ -0,0 +1,120 @@
+from functools import lru_cache
+import numpy as np
+from PIL import Image
+from block_reduce import block_reduce, block_expand
+
+# Classic print screen angles for the C, M, Y and K inks, in degrees.
+CMYK_SCREEN_ANGLES = (15, 75, 0, 45)
+
+# Map a cell's tone (0.0 to 1.0) to a dot radius as a fraction of the cell.
+# "linear" scales the radius with tone; "area" scales the dot area instead,
+# which is how ink coverage is measured in print.
+RADIUS_PROFILES = {
+    "linear": lambda tone: tone / 2,
+    "area": lambda tone: np.sqrt(tone / np.pi),
+}
+
+@lru_cache(maxsize=32)
+def dot_sprites(dot_size, levels, profile="linear"):
+    """
+    Pre-render one anti-aliased dot per quantized radius.
+
+    :param dot_size: Cell size in pixels.
+    :param levels: Number of quantized radii.
+    :param profile: Name from RADIUS_PROFILES.
+    :return: Read-only float32 array of shape (levels, dot_size, dot_size)
+             holding dot coverage from 0.0 to 1.0.
+    """
+    radii = RADIUS_PROFILES[profile](np.linspace(0.0, 1.0, levels)) * dot_size
+    centre = dot_size // 2
+    offsets = np.arange(dot_size, dtype=np.float32) + 0.5 - centre
+    distance = np.hypot(offsets[:, None], offsets[None, :])
+    # Coverage ramps over one pixel outside the nominal radius, matching the
+    # inclusive bounding box ImageDraw.ellipse used to fill
+    sprites = np.clip(radii[:, None, None] - distance[None] + 1, 0, 1).astype(np.float32)
+    sprites[0] = 0
+    sprites.flags.writeable = False
+    return sprites
+
+def _screen(tone, dot_size, levels, profile):
+    """
+    Build the dot coverage for a single-channel tone array.
+
+    :param tone: uint8 array of shape (H, W); 255 gives the largest dot.
+    :return: Tuple of (coverage array of shape (H, W), cell grid shape).
+    """
+    height, width = tone.shape
+    cells = block_reduce(tone, dot_size, dot_size)[:, :, 0]
+    index = np.rint(cells * ((levels - 1) / 255)).astype(np.intp)
+    sprites = dot_sprites(dot_size, levels, profile)
+    grid_h, grid_w = index.shape
+    # Stamp every cell at once by gathering sprites into a tiled array
+    tiles = sprites[index].transpose(0, 2, 1, 3).reshape(grid_h * dot_size, grid_w * dot_size)
+    return tiles[:height, :width], index.shape
+
+def _rotated(render, image, angle):
+    """
+    Run ``render`` on the image rotated by ``angle`` and rotate the result back.
+    """
+    if not angle % 360:
+        return render(image)
+    width, height = image.size
+    rotated = render(image.rotate(angle, resample=Image.BILINEAR, expand=True))
+    restored = rotated.rotate(-angle, resample=Image.BILINEAR, expand=True)
+    left = (restored.size[0] - width) // 2
+    top = (restored.size[1] - height) // 2
+    return restored.crop((left, top, left + width, top + height))
+
+def _mono_halftone(image, dot_size, levels):
+    rgb = np.asarray(image.convert("RGB"))
+    height, width = rgb.shape[:2]
+    coverage, (grid_h, grid_w) = _screen(np.asarray(image.convert("L")), dot_size, levels, "linear")
+    # Each dot takes the color at its cell centre
+    rows = np.minimum(np.arange(grid_h) * dot_size + dot_size // 2, height - 1)
+    cols = np.minimum(np.arange(grid_w) * dot_size + dot_size // 2, width - 1)
+    colors = block_expand(rgb[rows[:, None], cols], dot_size, dot_size, height, width)
+    output = colors * coverage[:, :, None]
+    return Image.fromarray(np.rint(output).astype(np.uint8))
+
+def _ink_halftone(band, dot_size, levels):
+    coverage, _ = _screen(np.asarray(band), dot_size, levels, "area")
+    return Image.fromarray(np.rint(coverage * 255).astype(np.uint8))
+
+def cmyk_separation(image):
+    """
+    Split an image into C, M, Y and K ink bands with full grey replacement.
+
+    Pillow's RGB to CMYK conversion never uses black ink, which renders greys
+    as overlapping color dots; here the shared grey component goes to K.
+
+    :param image: PIL Image object.
+    :return: Tuple of four 'L' mode images.
+    """
+    rgb = np.asarray(image.convert("RGB"), dtype=np.float32) / 255
+    black = 1 - rgb.max(axis=2)
+    white = np.maximum(1 - black, 1e-6)
+    inks = [(1 - rgb[:, :, c] - black) / white for c in range(3)] + [black]
+    return tuple(Image.fromarray(np.rint(ink * 255).astype(np.uint8)) for ink in inks)
+
+def halftone(image, dot_size=10, angle=0, cmyk=False, levels=None):
+    """
+    Render an image as a halftone screen.
+
+    :param image: PIL Image object.
+    :param dot_size: Cell size in pixels.
+    :param angle: Screen angle in degrees for the single-color screen.
+    :param cmyk: Render separate C, M, Y and K screens at CMYK_SCREEN_ANGLES.
+    :param levels: Number of quantized dot radii; defaults to quarter-pixel steps.
+    :return: RGB halftone image.
+    """
+    dot_size = max(1, int(dot_size))
+    if levels is None:
+        levels = 2 * dot_size + 1
+    if not cmyk:
+        return _rotated(lambda img: _mono_halftone(img, dot_size, levels), image, angle)
+    inks = cmyk_separation(image)
+    screens = [
+        _rotated(lambda band: _ink_halftone(band, dot_size, levels), ink, ink_angle + angle)
+        for ink, ink_angle in zip(inks, CMYK_SCREEN_ANGLES)
+    ]
+    return Image.merge("CMYK", screens).convert("RGB")
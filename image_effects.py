@@ -2,6 +2,7 @@
 import numpy as np
 from PIL import Image, ImageOps, ImageDraw, ImageFilter, ImageEnhance
 from scipy.spatial import Voronoi
+from seeding import make_rng, normal
 
 def sepia_filter(image):
     width, height = image.size
@@ -123,10 +124,10 @@ def halftone_effect(image, dot_size=10):
             draw.ellipse((center[0] - radius, center[1] - radius, center[0] + radius, center[1] + radius), fill=box.getpixel((dot_size//2, dot_size//2)))
     return output_image
 
-def voronoi_prism_effect(image, num_points=100):
+def voronoi_prism_effect(image, num_points=100, seed=None):
     width, height = image.size
     np_image = np.array(image)
-    points = np.random.rand(num_points, 2) * [width, height]
+    points = make_rng(seed).random((num_points, 2)) * [width, height]
     vor = Voronoi(points)
     output_image = Image.new("RGB", (width, height))
     draw = ImageDraw.Draw(output_image)
@@ -201,10 +202,10 @@ def lomo_filter(image):
     return image
 
 # Grey scale + grain
-def lima_effect(image, grain_amount=50):
+def lima_effect(image, grain_amount=50, seed=None):
     grayscale_image = image.convert("L")
     np_image = np.array(grayscale_image)
-    noise = np.random.normal(0, grain_amount, np_image.shape).astype(np.uint8)
+    noise = normal(make_rng(seed), grain_amount, np_image.shape).astype(np.uint8)
     noisy_image = np.clip(np_image + noise, 0, 255).astype(np.uint8)
     return Image.fromarray(noisy_image)
 
@@ -310,10 +311,10 @@ def adjust_rgb(image, r_factor, g_factor, b_factor):
             pixels[i, j] = (r, g, b)
     return image
 
-def add_grain(image, amount):
+def add_grain(image, amount, seed=None):
     # Implementation for adding grain
     width, height = image.size
-    grain = np.random.normal(scale=amount*255, size=(height, width, 3))
+    grain = normal(make_rng(seed), amount*255, (height, width, 3))
     grain_image = Image.fromarray(np.clip(np.array(image) + grain, 0, 255).astype('uint8'))
     return grain_image
 
@@ -362,12 +363,12 @@ def hdr_filter(image):
     return image
 
 
-def digital_noise_filter(image, noise_level=30):
+def digital_noise_filter(image, noise_level=30, seed=None):
     # Convert the image to a numpy array
     np_image = np.array(image)
     
     # Generate random noise
-    noise = np.random.randint(-noise_level, noise_level, np_image.shape, dtype='int16')
+    noise = make_rng(seed).integers(-noise_level, noise_level, np_image.shape, dtype='int16')
     
     # Add the noise to the image and clip the values to be in valid range [0, 255]
     np_image = np.clip(np_image + noise, 0, 255).astype('uint8')
@@ -377,12 +378,12 @@ def digital_noise_filter(image, noise_level=30):
     
     return noisy_image
 
-def spatial_noise_filter(image, random_noise_level=30, patterned_noise_level=20, pattern_frequency=10):
+def spatial_noise_filter(image, random_noise_level=30, patterned_noise_level=20, pattern_frequency=10, seed=None):
     # Convert the image to a numpy array
     np_image = np.array(image)
     
     # Generate random noise
-    random_noise = np.random.randint(-random_noise_level, random_noise_level, np_image.shape, dtype='int16')
+    random_noise = make_rng(seed).integers(-random_noise_level, random_noise_level, np_image.shape, dtype='int16')
     
     # Generate patterned noise (e.g., sinusoidal pattern)
     patterned_noise = np.zeros_like(np_image, dtype='int16')
@@ -400,13 +401,13 @@ def spatial_noise_filter(image, random_noise_level=30, patterned_noise_level=20,
     
     return noisy_image
 
-def luminance_noise_filter(image, noise_level=30):
+def luminance_noise_filter(image, noise_level=30, seed=None):
     # Convert the image to grayscale (luminance channel)
     luminance = image.convert("L")
     np_luminance = np.array(luminance)
     
     # Generate random noise
-    noise = np.random.randint(-noise_level, noise_level, np_luminance.shape, dtype='int16')
+    noise = make_rng(seed).integers(-noise_level, noise_level, np_luminance.shape, dtype='int16')
     
     # Add the noise to the luminance channel and clip the values to be in valid range [0, 255]
     np_luminance = np.clip(np_luminance + noise, 0, 255).astype('uint8')
@@ -426,13 +427,13 @@ def luminance_noise_filter(image, noise_level=30):
     
     return noisy_image
 
-def fpn_filter(image, noise_level=30):
+def fpn_filter(image, noise_level=30, seed=None):
     # Convert the image to a numpy array
     np_image = np.array(image)
     
     # Generate fixed pattern noise
     rows, cols, _ = np_image.shape
-    fpn_noise = np.random.randint(-noise_level, noise_level, (rows, cols, 1), dtype='int16')
+    fpn_noise = make_rng(seed).integers(-noise_level, noise_level, (rows, cols, 1), dtype='int16')
     fpn_noise = np.repeat(fpn_noise, 3, axis=2)
     
     # Add the fixed pattern noise to the image and clip the values to be in valid range [0, 255]
@@ -447,8 +448,7 @@ def generate_grain_mask(img_width, img_height, grain_size, seed=None):
     """
     Generate a grain mask for adding film grain effect.
     """
-    np.random.seed(seed)
-    noise = np.random.normal(loc=0, scale=grain_size, size=(img_height, img_width))
+    noise = normal(make_rng(seed), grain_size, (img_height, img_width))
     noise = np.clip(noise, -255, 255)  # Ensure the noise is within pixel value range
     noise = (noise - noise.min()) / (noise.max() - noise.min()) * 255  # Normalize noise to 0-255
     mask = Image.fromarray(noise.astype(np.uint8))
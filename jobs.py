@@ -0,0 +1,230 @@
+from collections import OrderedDict
+import queue
+import threading
+import time
+import uuid
+
+# Job states; the last four are final.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMEOUT = 'timeout'
+FINAL_STATES = {DONE, FAILED, CANCELLED, TIMEOUT}
+
+class QueueFull(Exception):
+    """
+    Raised when a job is submitted while the queue holds its maximum number
+    of waiting jobs.
+    """
+
+class Job:
+    """
+    Record of one submitted call and its outcome.
+    """
+    def __init__(self, function, args, kwargs, timeout, discard=None):
+        self.id = uuid.uuid4().hex
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.discard = discard
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        """
+        :return: JSON-serialisable summary of the job, without its result.
+        """
+        return {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+class LocalJobQueue:
+    """
+    In-process job queue served by a fixed pool of worker threads, for
+    deployments without an external broker.
+
+    Jobs wait in a bounded FIFO queue. A queued job that is cancelled never
+    runs. Python threads cannot be interrupted, so a running job that is
+    cancelled or exceeds its timeout is marked as such right away and its
+    result is discarded when the call returns, through the job's ``discard``
+    callback if it has one.
+    """
+    def __init__(self, workers=2, max_queue=16, timeout=None, history=256):
+        """
+        :param workers: Number of worker threads.
+        :param max_queue: Maximum number of jobs waiting for a worker.
+        :param timeout: Seconds a job may run before it is marked as timed out, or None.
+        :param history: Number of finished jobs kept for status queries.
+        """
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.history = history
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start_workers(self):
+        # Threads are started on first use, so importing the app stays cheap
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'job-worker-{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started = time.time()
+            try:
+                result, error = job.function(*job.args, **job.kwargs), None
+            except Exception as e:
+                result, error = None, f'{type(e).__name__}: {e}'
+            with self._lock:
+                self._expire(job)
+                kept = job.status == RUNNING
+                if kept:
+                    job.status = DONE if error is None else FAILED
+                    job.result, job.error = result, error
+                    job.finished = time.time()
+                discard, job.function, job.args, job.kwargs, job.discard = job.discard, None, None, None, None
+                self._prune()
+            if not kept and error is None and discard is not None:
+                # The job was cancelled or timed out while running; release what it made
+                try:
+                    discard(result)
+                except Exception:
+                    pass
+
+    def _expire(self, job):
+        # Mark a running job that has outlived its timeout; called with the lock held
+        if job.status == RUNNING and job.timeout is not None and time.time() - job.started > job.timeout:
+            job.status = TIMEOUT
+            job.error = f'Job exceeded its timeout of {job.timeout} seconds'
+            job.finished = time.time()
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond the history size
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINAL_STATES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def submit(self, function, *args, timeout=None, discard=None, **kwargs):
+        """
+        Queue a call to run on a worker thread.
+
+        :param function: Callable to run.
+        :param args: Positional arguments for the callable.
+        :param timeout: Seconds the job may run; defaults to the queue's timeout.
+        :param discard: Called with the return value of a call that finished
+                        after the job was cancelled or timed out, e.g. to
+                        delete a file it wrote.
+        :param kwargs: Keyword arguments for the callable.
+        :return: Job ID.
+        :raises QueueFull: If the maximum number of jobs are already waiting.
+        """
+        job = Job(function, args, kwargs, self.timeout if timeout is None else timeout, discard)
+        with self._lock:
+            self._start_workers()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f'Job queue is full ({self._queue.maxsize} jobs waiting)')
+            self._jobs[job.id] = job
+        return job.id
+
+    def get(self, job_id):
+        """
+        :return: Job with the given ID, or None if it is unknown or was pruned.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._expire(job)
+            return job
+
+    def status(self, job_id):
+        """
+        :return: Dict describing the job (see Job.to_dict), or None if it is unknown.
+        """
+        job = self.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def result(self, job_id):
+        """
+        :return: Return value of a finished job, or None if it has not finished successfully.
+        """
+        job = self.get(job_id)
+        return job.result if job is not None and job.status == DONE else None
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+
+        :param job_id: Job ID.
+        :return: True if the job was cancelled, False if it is unknown or already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            self._expire(job)
+            if job.status in FINAL_STATES:
+                return False
+            job.status = CANCELLED
+            job.finished = time.time()
+            return True
+
+    def pending(self):
+        """
+        :return: Number of jobs waiting for a worker.
+        """
+        with self._lock:
+            return sum(job.status == QUEUED for job in self._jobs.values())
+
+# Job queue implementations selectable with the JOB_BACKEND setting.
+JOB_BACKENDS = {
+    'local': LocalJobQueue,
+}
+
+def create_job_queue(config):
+    """
+    Build the job queue an app's settings ask for.
+
+    :param config: Flask config or dict with JOB_BACKEND, JOB_WORKERS,
+                   JOB_QUEUE_DEPTH and JOB_TIMEOUT.
+    :return: Job queue object.
+    """
+    backend = config.get('JOB_BACKEND', 'local')
+    if backend not in JOB_BACKENDS:
+        raise ValueError(f"Unknown job backend '{backend}'")
+    return JOB_BACKENDS[backend](
+        workers=config.get('JOB_WORKERS', 2),
+        max_queue=config.get('JOB_QUEUE_DEPTH', 16),
+        timeout=config.get('JOB_TIMEOUT'),
+        history=config.get('JOB_HISTORY', 256),
+    )
+
+def get_job_queue(app):
+    """
+    :param app: Flask app.
+    :return: The app's job queue, created from its config on first use.
+    """
+    if 'jobs' not in app.extensions:
+        app.extensions.setdefault('jobs', create_job_queue(app.config))
+    return app.extensions['jobs']
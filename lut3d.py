@@ -0,0 +1,151 @@
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageFilter
+import effects_aggregator
+from effect_traits import is_pointwise
+
+# Color3DLUT accepts between 2 and 65 points per axis; with 52 points
+# (size - 1) divides 255, so every lattice point is an exact 8-bit color.
+DEFAULT_LUT_SIZE = 52
+
+def identity_cube(size=DEFAULT_LUT_SIZE):
+    """
+    Build an RGB image holding every lattice color of a 3D LUT.
+
+    Pixels are ordered red fastest, then green, then blue, which is the
+    table order used by Color3DLUT and .cube files.
+
+    :param size: Number of lattice points per axis.
+    :return: RGB image of size (size, size * size).
+    """
+    levels = np.rint(np.linspace(0, 255, size)).astype(np.uint8)
+    b, g, r = np.meshgrid(levels, levels, levels, indexing="ij")
+    cube = np.stack([r, g, b], axis=-1).reshape(size * size, size, 3)
+    return Image.fromarray(cube)
+
+def bake_chain(effect_functions, size=DEFAULT_LUT_SIZE):
+    """
+    Probe a chain of effect functions on the identity cube and bake the result.
+
+    :param effect_functions: Sequence of callables taking and returning an image.
+    :param size: Number of lattice points per axis.
+    :return: ImageFilter.Color3DLUT reproducing the chain.
+    """
+    image = identity_cube(size)
+    for effect in effect_functions:
+        image = effect(image)
+    table = np.asarray(image.convert("RGB"), dtype=np.float32).reshape(-1, 3) / 255
+    return ImageFilter.Color3DLUT(size, table.ravel().tolist())
+
+@lru_cache(maxsize=16)
+def _bake_named(effect_names, size):
+    return bake_chain([effects_aggregator.effects[name] for name in effect_names], size)
+
+def bake_effects(effect_names, size=DEFAULT_LUT_SIZE, strict=True):
+    """
+    Bake a chain of named effects from effects_aggregator into a 3D LUT.
+
+    :param effect_names: Sequence of effect names, applied in order.
+    :param size: Number of lattice points per axis.
+    :param strict: Refuse effects that have not been declared pointwise.
+    :return: Cached ImageFilter.Color3DLUT.
+    """
+    effect_names = tuple(effect_names)
+    for name in effect_names:
+        if name not in effects_aggregator.effects:
+            raise KeyError(f"Effect '{name}' not found in effects_aggregator.")
+        if strict and not is_pointwise(effects_aggregator.effects[name]):
+            raise ValueError(f"Effect '{name}' is not pointwise and cannot be baked safely.")
+    return _bake_named(effect_names, size)
+
+@lru_cache(maxsize=64)
+def chain_mode(effect_names, mode):
+    """
+    Mode a chain of named effects produces from an image of a given mode.
+    A baked LUT always outputs RGB or RGBA, so chains ending in a mode change
+    (such as Grayscale) must be converted afterwards.
+
+    :param effect_names: Tuple of effect names, applied in order.
+    :param mode: Mode of the input image.
+    :return: Mode of the chain's output.
+    """
+    image = Image.new(mode, (1, 1))
+    for name in effect_names:
+        image = effects_aggregator.effects[name](image)
+    return image.mode
+
+def can_bake(effect_names):
+    """
+    Check whether every named effect is known and declared pointwise.
+
+    :param effect_names: Sequence of effect names.
+    :return: True if the chain can be baked with ``strict=True``.
+    """
+    return all(
+        name in effects_aggregator.effects and is_pointwise(effects_aggregator.effects[name])
+        for name in effect_names
+    )
+
+def apply_lut3d(image, lut):
+    """
+    Apply a baked 3D LUT to an image in one pass.
+
+    :param image: PIL Image object (RGB or RGBA; other modes are converted to RGB).
+    :param lut: ImageFilter.Color3DLUT.
+    :return: Filtered image.
+    """
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    return image.filter(lut)
+
+def save_cube(lut, path, title=None):
+    """
+    Write a 3D LUT to an Adobe/Resolve .cube file.
+
+    :param lut: ImageFilter.Color3DLUT with three channels.
+    :param path: Destination file path.
+    :param title: Optional title stored in the file.
+    """
+    size = lut.size[0]
+    table = np.asarray(lut.table, dtype=np.float64).reshape(-1, 3)
+    with open(path, "w") as cube_file:
+        if title:
+            cube_file.write(f'TITLE "{title}"\n')
+        cube_file.write(f"LUT_3D_SIZE {size}\n")
+        cube_file.write("DOMAIN_MIN 0.0 0.0 0.0\n")
+        cube_file.write("DOMAIN_MAX 1.0 1.0 1.0\n")
+        for r, g, b in table:
+            cube_file.write(f"{r:.6f} {g:.6f} {b:.6f}\n")
+
+def load_cube(path):
+    """
+    Read a 3D LUT from a .cube file.
+
+    :param path: Source file path.
+    :return: ImageFilter.Color3DLUT.
+    """
+    size = None
+    rows = []
+    with open(path) as cube_file:
+        for line in cube_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            keyword, _, rest = line.partition(" ")
+            if keyword == "LUT_3D_SIZE":
+                size = int(rest)
+            elif keyword.startswith("LUT_1D"):
+                raise ValueError(f"{path} is a 1D LUT; only 3D .cube files are supported")
+            elif keyword in ("DOMAIN_MIN", "DOMAIN_MAX"):
+                expected = 0.0 if keyword == "DOMAIN_MIN" else 1.0
+                if any(float(value) != expected for value in rest.split()):
+                    raise ValueError(f"{path} uses a non-unit input domain")
+            elif keyword == "TITLE":
+                continue
+            else:
+                rows.append([float(value) for value in line.split()])
+    if size is None:
+        raise ValueError(f"{path} has no LUT_3D_SIZE")
+    if len(rows) != size ** 3:
+        raise ValueError(f"{path} has {len(rows)} entries, expected {size ** 3}")
+    return ImageFilter.Color3DLUT(size, [value for row in rows for value in row])
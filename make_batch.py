@@ -1,20 +1,49 @@
 from PIL import Image, ImageOps, ImageEnhance
 import numpy as np
 import os
+import time
+import queue
+import threading
+import importlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import effects_aggregator
+import lut3d
+import tiling
+import shared_frames
+import encoding
+from effect_traits import is_resolution_independent, scaled_params
+from batch_manifest import BatchManifest, MANIFEST_NAME
 
-def apply_effects(image, effects, **kwargs):
+def apply_effects(image, effects, bake=True, scale=None, tile_size=None, **kwargs):
     """
     Apply a list of effects to an image.
     
     :param image: PIL Image object.
     :param effects: List of effect names to apply.
+    :param bake: Run chains of pointwise effects as a single baked 3D LUT.
+    :param scale: Resize factor already applied to the image; pixel-sized
+                  effect parameters are rescaled by it.
+    :param tile_size: Run each effect tile by tile with tiles of this size,
+                      for images too large to process whole; None disables tiling.
     :param kwargs: Additional arguments for the effects.
     :return: Modified image.
     """
+    if bake and len(effects) > 1 and not kwargs and lut3d.can_bake(effects):
+        mode = lut3d.chain_mode(tuple(effects), image.mode)
+        image = lut3d.apply_lut3d(image, lut3d.bake_effects(effects))
+        return image if image.mode == mode else image.convert(mode)
+    if tile_size:
+        run = lambda effect_function, image, **params: tiling.apply_tiled(image, effect_function, tile_size, **params)
+    else:
+        run = lambda effect_function, image, **params: effect_function(image, **params)
+    if scale is not None:
+        for effect in effects:
+            effect_function = effects_aggregator.effects[effect]
+            image = run(effect_function, image, **scaled_params(effect_function, scale), **kwargs)
+        return image
     for effect in effects:
         if effect in effects_aggregator.effects:
-            image = effects_aggregator.effects[effect](image, **kwargs)
+            image = run(effects_aggregator.effects[effect], image, **kwargs)
         else:
             print(f"Effect '{effect}' not found in effects_aggregator.")
     return image
@@ -61,17 +90,373 @@ def add_border(image, border_size=50, border_color=(255, 255, 255), bottom_borde
 
     return final_image
 
-def process_images_in_folder(input_folder, output_folder, effects, target_size=(800, 800), border_size=50, border_color=(255, 255, 255), bottom_border_factor=1.5):
+STAGES = ("decode", "effects", "resize", "border", "encode")
+
+def _init_worker():
+    """
+    Process pool initializer: import the effect modules once per worker.
+    """
+    importlib.import_module("effects_aggregator")
+
+# Draft decoding asks for this multiple of the final size before the
+# LANCZOS resize, like Image.thumbnail's reducing_gap.
+DRAFT_GAP = 2.0
+
+def can_resize_first(effects):
+    """
+    Check whether an effect chain can run after resizing instead of before.
+    
+    :param effects: List of effect names.
+    :return: True if every effect is known and declared resolution independent
+             or declares its pixel-sized parameters.
+    """
+    return all(
+        effect in effects_aggregator.effects and is_resolution_independent(effects_aggregator.effects[effect])
+        for effect in effects
+    )
+
+def decode_image(input_image_path, effects=None, target_size=None, resize_first=False):
+    """
+    Open an image and decode its pixels.
+    
+    With resize_first, when the effect chain allows it, JPEGs are decoded
+    directly at the smallest DCT scale that still covers the target size and
+    the image is resized before any effect runs.
+    
+    :param input_image_path: Path to the source image.
+    :param effects: List of effect names that will be applied.
+    :param target_size: Tuple (width, height) of the final size, or None.
+    :param resize_first: Plan the resize before the effects when possible.
+    :return: Tuple of (decoded PIL Image object, seconds spent, resize factor
+             already applied or None if the image is at full resolution).
+    """
+    start = time.perf_counter()
+    image = Image.open(input_image_path)
+    scale = None
+    if resize_first and target_size and can_resize_first(effects or []):
+        width, height = image.size
+        scale = min(target_size[0] / width, target_size[1] / height, 1.0)
+        if scale < 1.0:
+            draft_size = (max(1, int(width * scale * DRAFT_GAP)), max(1, int(height * scale * DRAFT_GAP)))
+            image.draft("RGB", draft_size)
+            image.load()
+            image = resize_image(image, target_size)
+            scale = image.size[0] / width
+    image.load()
+    return image, time.perf_counter() - start, scale
+
+def render_image(image, effects, target_size=(800, 800), border_size=50, border_color=(255, 255, 255), bottom_border_factor=1.5, tile_size=None, scale=None):
+    """
+    Apply effects, resize and add the border to a decoded image.
+    
+    :param image: PIL Image object.
+    :param effects: List of effect names to apply.
+    :param target_size: Tuple (width, height) for resizing, or None to keep the size.
+    :param border_size: Size of the border around the image.
+    :param border_color: Color of the border.
+    :param bottom_border_factor: Factor to increase the bottom border size for Polaroid effect.
+    :param tile_size: Apply the effects tile by tile with tiles of this size, or None.
+    :param scale: Resize factor already applied by decode_image, if any.
+    :return: Tuple of (final image, dict of stage name to seconds spent).
+    """
+    timings = {}
+    kwargs = {}
+
+    # Apply effects
+    start = time.perf_counter()
+    image = apply_effects(image, effects, scale=scale, tile_size=tile_size, **kwargs)
+    timings["effects"] = time.perf_counter() - start
+    
+    # Resize image
+    start = time.perf_counter()
+    if target_size:
+        image = resize_image(image, target_size)
+    timings["resize"] = time.perf_counter() - start
+    
+    # Add border
+    start = time.perf_counter()
+    image = add_border(image, border_size, border_color, bottom_border_factor)
+    timings["border"] = time.perf_counter() - start
+    return image, timings
+
+def encode_image(image, output_image_path, profile="final", max_bytes=None):
+    """
+    Encode and write an image.
+    
+    :param image: PIL Image object.
+    :param output_image_path: Path to write the result to.
+    :param profile: Encoding profile name, see encoding.ENCODING_PROFILES.
+    :param max_bytes: Maximum size of lossy output, or None.
+    :return: Seconds spent.
+    """
+    start = time.perf_counter()
+    # Write to a temporary file and rename it into place, so an interrupted
+    # run never leaves a truncated image under the final name
+    temp_path = output_image_path + ".tmp"
+    encoding.save_image(image, temp_path, profile, max_bytes, format=encoding.format_for_path(output_image_path))
+    os.replace(temp_path, output_image_path)
+    return time.perf_counter() - start
+
+def process_single_image(input_image_path, output_image_path, effects, target_size=(800, 800), border_size=50, border_color=(255, 255, 255), bottom_border_factor=1.5, tile_size=None, resize_first=False, profile="final", max_bytes=None):
+    """
+    Open, process and save one image, timing each stage.
+    
+    :param input_image_path: Path to the source image.
+    :param output_image_path: Path to write the result to.
+    :param effects: List of effect names to apply.
+    :param target_size: Tuple (width, height) for resizing, or None to keep the size.
+    :param border_size: Size of the border around the image.
+    :param border_color: Color of the border.
+    :param bottom_border_factor: Factor to increase the bottom border size for Polaroid effect.
+    :param tile_size: Apply the effects tile by tile with tiles of this size, or None.
+    :param resize_first: Resize before the effects when the chain allows it.
+    :param profile: Encoding profile name, see encoding.ENCODING_PROFILES.
+    :param max_bytes: Maximum size of lossy output, or None.
+    :return: Dict of stage name to seconds spent.
+    """
+    image, decode_time, scale = decode_image(input_image_path, effects, target_size, resize_first)
+    image, timings = render_image(image, effects, target_size, border_size, border_color, bottom_border_factor, tile_size, scale=scale)
+    timings["decode"] = decode_time
+    timings["encode"] = encode_image(image, output_image_path, profile, max_bytes)
+    return timings
+
+def _run_job(job):
+    """
+    Run one job and capture its error instead of raising, so one bad file
+    does not abort the batch.
+    
+    :return: Tuple of (input path, output path, timings or None, error message or None).
+    """
+    input_image_path, output_image_path, args, resize_first, (profile, max_bytes) = job
+    try:
+        timings = process_single_image(input_image_path, output_image_path, *args, resize_first=resize_first, profile=profile, max_bytes=max_bytes)
+        return input_image_path, output_image_path, timings, None
+    except Exception as exc:
+        return input_image_path, output_image_path, None, f"{type(exc).__name__}: {exc}"
+
+def _render_job(image, args, scale=None):
+    """
+    Compute stage of the streaming pipeline; errors are returned, not raised.
+    
+    :return: Tuple of (image or None, timings or None, error message or None).
+    """
+    try:
+        image, timings = render_image(image, *args, scale=scale)
+        return image, timings, None
+    except Exception as exc:
+        return None, None, f"{type(exc).__name__}: {exc}"
+
+def _output_nbytes(size, target_size, border_size, bottom_border_factor):
+    """
+    Upper bound on the size of a rendered frame: add_border squares the
+    resized image and returns RGB.
+    """
+    side = max(size)
+    if target_size:
+        side = min(side, max(target_size))
+    side += border_size * 2
+    return shared_frames.frame_nbytes("RGB", (side, side + int(border_size * bottom_border_factor)))
+
+def _render_shared(descriptor, output_name, args, scale=None):
+    """
+    Compute stage of the streaming pipeline for process workers. The frame is
+    read from, and the result written to, shared memory blocks owned by the
+    coordinator, so only descriptors cross the process boundary.
+    
+    :param descriptor: Frame descriptor of the decoded image.
+    :param output_name: Name of the shared memory block for the result.
+    :return: Tuple of (result descriptor, or None with the image itself if it
+             did not fit the block; image or None; timings or None; error or None).
+    """
+    source = shared_frames.attach_frame(descriptor["name"])
+    target = shared_frames.attach_frame(output_name)
+    try:
+        image = shared_frames.read_frame(source, descriptor)
+        # RGB frames are mapped as RGBX; effects expect RGB
+        if image.mode == "RGBX":
+            image = image.convert("RGB")
+        image, timings, error = _render_job(image, args, scale)
+        if error is not None:
+            return None, None, None, error
+        try:
+            return shared_frames.write_frame(target, image), None, timings, None
+        except (KeyError, ValueError):
+            return None, image, timings, None
+    finally:
+        image = None
+        shared_frames.release_frame(source)
+        shared_frames.release_frame(target)
+
+def _run_pipeline(jobs, workers=1, io_threads=2, max_frames=8, on_done=None):
+    """
+    Stream jobs through overlapped decode, compute and encode stages.
+    
+    Decoding and encoding run on I/O threads (Pillow releases the GIL while
+    coding), effects run on a pool of compute workers. A semaphore is held
+    from decode until the frame is written, so at most ``max_frames``
+    decoded images are in memory at any time. With process workers, frames
+    travel through shared memory and only their descriptors are pickled.
+    
+    :param jobs: List of (input path, output path, render args, resize_first,
+                 (encoding profile, max bytes)) tuples.
+    :param workers: Compute workers; above 1 they are processes.
+    :param io_threads: Threads for each of the decode and encode stages.
+    :param max_frames: Maximum number of decoded frames in flight.
+    :param on_done: Called from an encode thread with each finished result tuple.
+    :return: List of (input path, output path, timings, error) tuples in input order.
+    """
+    results = [None] * len(jobs)
+    frames = threading.BoundedSemaphore(max_frames)
+    pending = queue.Queue()
+    for index in range(len(jobs)):
+        pending.put(index)
+    decoded = queue.Queue(maxsize=max_frames)
+    rendered = queue.Queue()
+    shared = workers > 1
+    # Shared memory blocks per job index: (decoded frame, rendered frame);
+    # frames in modes without a shared layout are pickled instead
+    blocks = {}
+
+    def fail(index, error):
+        results[index] = (jobs[index][0], jobs[index][1], None, error)
+
+    def decoder():
+        while True:
+            try:
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            frames.acquire()
+            input_image_path, _, args, resize_first, _ = jobs[index]
+            try:
+                image, decode_time, scale = decode_image(input_image_path, args[0], args[1], resize_first)
+                if shared and image.mode in shared_frames.MODE_BYTES:
+                    # Hand the pixels over to shared memory and drop the decoded copy
+                    _, target_size, border_size, _, bottom_border_factor = args[:5]
+                    blocks[index] = (
+                        shared_frames.create_frame(shared_frames.frame_nbytes(image.mode, image.size)),
+                        shared_frames.create_frame(_output_nbytes(image.size, target_size, border_size, bottom_border_factor)),
+                    )
+                    image = shared_frames.write_frame(blocks[index][0], image)
+            except Exception as exc:
+                fail(index, f"{type(exc).__name__}: {exc}")
+                for block in blocks.pop(index, ()):
+                    shared_frames.release_frame(block, unlink=True)
+                frames.release()
+                continue
+            decoded.put((index, image, decode_time, scale))
+
+    def encoder():
+        while True:
+            item = rendered.get()
+            if item is None:
+                return
+            index, decode_time, future = item
+            image = None
+            try:
+                if index in blocks:
+                    descriptor, image, timings, error = future.result()
+                    if descriptor is not None:
+                        image = shared_frames.read_frame(blocks[index][1], descriptor)
+                else:
+                    image, timings, error = future.result()
+                if error is not None:
+                    fail(index, error)
+                    continue
+                timings["decode"] = decode_time
+                timings["encode"] = encode_image(image, jobs[index][1], *jobs[index][4])
+                results[index] = (jobs[index][0], jobs[index][1], timings, None)
+                if on_done:
+                    on_done(results[index])
+            except Exception as exc:
+                fail(index, f"{type(exc).__name__}: {exc}")
+            finally:
+                image = None
+                for block in blocks.pop(index, ()):
+                    shared_frames.release_frame(block, unlink=True)
+                frames.release()
+
+    decoders = [threading.Thread(target=decoder, daemon=True) for _ in range(io_threads)]
+    encoders = [threading.Thread(target=encoder, daemon=True) for _ in range(io_threads)]
+    for thread in decoders + encoders:
+        thread.start()
+
+    if workers > 1:
+        compute = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    else:
+        compute = ThreadPoolExecutor(max_workers=1)
+    with compute:
+        remaining = len(jobs)
+        while remaining:
+            # Failed decodes never reach the queue, so poll for decoder exit
+            try:
+                index, image, decode_time, scale = decoded.get(timeout=0.1)
+            except queue.Empty:
+                if not any(thread.is_alive() for thread in decoders) and decoded.empty():
+                    break
+                continue
+            remaining -= 1
+            if index in blocks:
+                future = compute.submit(_render_shared, image, blocks[index][1].name, jobs[index][2], scale)
+            else:
+                future = compute.submit(_render_job, image, jobs[index][2], scale)
+            rendered.put((index, decode_time, future))
+        for _ in encoders:
+            rendered.put(None)
+        for thread in encoders:
+            thread.join()
+    return results
+
+def _report(results, elapsed):
+    """
+    Print throughput and summed per-stage timings for a batch run.
+    """
+    done = [timings for _, _, timings, error in results if error is None]
+    failed = [(path, error) for path, _, _, error in results if error is not None]
+    rate = len(done) / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {len(done)} images in {elapsed:.2f}s ({rate:.2f} images/s), {len(failed)} failed")
+    for stage in STAGES:
+        total = sum(timings[stage] for timings in done)
+        average = total / len(done) if done else 0.0
+        print(f"  {stage:<8} {total:8.2f}s total {average * 1000:8.1f}ms/image")
+    for path, error in failed:
+        print(f"  failed: {path}: {error}")
+
+def process_images_in_folder(input_folder, output_folder, effects, target_size=(800, 800), border_size=50, border_color=(255, 255, 255), bottom_border_factor=1.5, workers=1, pipeline=False, io_threads=2, max_frames=8, resize_first=False, manifest=False, tile_size=None, profile="final", max_bytes=None, output_extension=None):
     """
     Process all images in a folder: apply effects, resize, add border, and save.
     
+    Output files are numbered 001, 002, ... in sorted input order, whatever
+    order the workers finish in. A file that fails to process is reported
+    and skipped.
+    
+    With a manifest, inputs whose content, effects and parameters match a
+    finished record are skipped, so reruns only process new or modified
+    files and an interrupted run resumes where it stopped. Known inputs keep
+    their output name; new inputs are numbered after the highest one in use.
+    
     :param input_folder: Path to the input folder.
     :param output_folder: Path to the output folder.
     :param effects: List of effect names to apply.
-    :param target_size: Tuple (width, height) for resizing.
+    :param target_size: Tuple (width, height) for resizing, or None to keep the size.
     :param border_size: Size of the border around the image.
     :param border_color: Color of the border.
     :param bottom_border_factor: Factor to increase the bottom border size for Polaroid effect.
+    :param workers: Number of worker processes; 1 processes images in this process.
+    :param pipeline: Overlap decoding, effects and encoding in a streaming pipeline.
+    :param io_threads: Decode and encode threads per stage when pipelining.
+    :param max_frames: Maximum decoded frames held in memory when pipelining.
+    :param resize_first: Decode JPEGs at reduced size and resize before the
+                         effects when every effect in the chain allows it.
+    :param manifest: Track finished outputs in a manifest; True stores it in
+                     the output folder, a string gives its path.
+    :param tile_size: Apply the effects tile by tile with tiles of this size,
+                      bounding memory on very large images; None disables tiling.
+    :param profile: Encoding profile name, see encoding.ENCODING_PROFILES.
+    :param max_bytes: Maximum size of each lossy output file, or None.
+    :param output_extension: Extension selecting the output format, e.g. ".webp";
+                             None keeps each input's extension.
+    :return: List of (input path, output path, timings, error) tuples in input order.
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
@@ -79,27 +464,89 @@ def process_images_in_folder(input_folder, output_folder, effects, target_size=(
     allowed_extensions = {'.jpeg', '.jpg'}
     files = [file for file in sorted(os.listdir(input_folder)) if os.path.splitext(file)[1].lower() in allowed_extensions]
 
+    args = (effects, target_size, border_size, border_color, bottom_border_factor, tile_size)
+    params = {
+        "target_size": list(target_size) if target_size else None,
+        "border_size": border_size,
+        "border_color": list(border_color),
+        "bottom_border_factor": bottom_border_factor,
+        "resize_first": resize_first,
+        "tile_size": tile_size,
+        "profile": profile,
+        "max_bytes": max_bytes,
+        "output_extension": output_extension,
+    }
+    batch_manifest = None
+    if manifest:
+        manifest_path = manifest if isinstance(manifest, str) else os.path.join(output_folder, MANIFEST_NAME)
+        batch_manifest = BatchManifest(manifest_path)
+        used = [os.path.splitext(os.path.basename(path))[0] for path in batch_manifest.outputs()]
+        next_index = max((int(name) for name in used if name.isdigit()), default=0) + 1
+
+    jobs = []
+    fingerprints = {}
+    skipped = 0
     for index, file in enumerate(files, start=1):
         input_image_path = os.path.join(input_folder, file)
-        output_image_path = os.path.join(output_folder, f"{index:03d}{os.path.splitext(file)[1]}")
-        kwargs = {}
-        image = Image.open(input_image_path)
-
-        # Apply effects
-        image = apply_effects(image, effects, **kwargs)
-        
-        # Resize image
-        image = resize_image(image, target_size)
-        
-        # Add border
-        image = add_border(image, border_size, border_color, bottom_border_factor)
-        
-        # Save the result
-        image.save(output_image_path)
-        print(f"Processed and saved: {output_image_path}")
+        extension = output_extension or os.path.splitext(file)[1]
+        output_image_path = os.path.join(output_folder, f"{index:03d}{extension}")
+        if batch_manifest:
+            fingerprint = batch_manifest.fingerprint(input_image_path)
+            if batch_manifest.is_done(input_image_path, fingerprint, effects, params):
+                skipped += 1
+                continue
+            record = batch_manifest.lookup(input_image_path)
+            if record:
+                # Keep the input's number, but the extension selects the format
+                output_image_path = os.path.splitext(record["output"])[0] + extension
+            else:
+                output_image_path = os.path.join(output_folder, f"{next_index:03d}{extension}")
+                next_index += 1
+            fingerprints[input_image_path] = fingerprint
+        jobs.append((input_image_path, output_image_path, args, resize_first, (profile, max_bytes)))
+    if skipped:
+        print(f"Skipped {skipped} unchanged images")
+
+    # Remove temporary files an interrupted run left for these outputs;
+    # other files in the output folder are not ours to delete
+    for job in jobs:
+        temp_path = job[1] + ".tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    def finish(result):
+        input_image_path, output_image_path, _, error = result
+        if error is None:
+            if batch_manifest:
+                batch_manifest.record(input_image_path, fingerprints[input_image_path], effects, params, output_image_path)
+            print(f"Processed and saved: {output_image_path}")
+
+    start = time.perf_counter()
+    results = []
+    try:
+        if pipeline:
+            results = _run_pipeline(jobs, workers, io_threads, max_frames, on_done=finish)
+        elif workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = {pool.submit(_run_job, job): position for position, job in enumerate(jobs)}
+                results = [None] * len(jobs)
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    finish(results[futures[future]])
+        else:
+            for job in jobs:
+                result = _run_job(job)
+                results.append(result)
+                finish(result)
+    finally:
+        if batch_manifest:
+            batch_manifest.close()
+    _report(results, time.perf_counter() - start)
+    return results
 
 if __name__ == "__main__":
     input_folder = 'D:\\input'
     output_folder = 'D:\\output'
     effects = ['Polaroid']  # List of effects to apply
-    process_images_in_folder(input_folder, output_folder, effects, target_size=(800, 800), border_size=50, border_color=(255, 255, 255), bottom_border_factor=1.5)
+    workers = os.cpu_count() or 1  # Number of worker processes
+    process_images_in_folder(input_folder, output_folder, effects, target_size=(800, 800), border_size=50, border_color=(255, 255, 255), bottom_border_factor=1.5, workers=workers)
@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+# Tables are cached per (r_factor, g_factor, b_factor).
+LUT_CACHE_SIZE = 64
+
+@lru_cache(maxsize=LUT_CACHE_SIZE)
+def channel_scale_lut(r_factor=1.0, g_factor=1.0, b_factor=1.0):
+    """
+    Build a 768-entry lookup table that scales each RGB channel.
+
+    Values are left unrounded so Image.point converts them exactly as it did
+    for the per-band ``point(lambda i: i * factor)`` calls this replaces.
+
+    :param r_factor: Multiplier for the red channel.
+    :param g_factor: Multiplier for the green channel.
+    :param b_factor: Multiplier for the blue channel.
+    :return: Tuple of 768 values, 256 per band.
+    """
+    return tuple(
+        i * factor
+        for factor in (r_factor, g_factor, b_factor)
+        for i in range(256)
+    )
+
+def scaled_factor(factor, strength=1.0):
+    """
+    Move a channel factor towards 1.0 (no change) or beyond it.
+
+    :param factor: Channel multiplier at full strength.
+    :param strength: 0.0 leaves the channel untouched, 1.0 gives ``factor``.
+    :return: Adjusted multiplier.
+    """
+    if strength == 1:
+        return factor
+    return 1 + (factor - 1) * strength
+
+def apply_lut(image, lut):
+    """
+    Apply a 768-entry RGB lookup table in a single Image.point call.
+
+    :param image: PIL Image object (RGB or RGBA; other modes are converted to RGB).
+    :param lut: Sequence of 768 values, 256 per band.
+    :return: Image with the table applied; alpha is left untouched.
+    """
+    if image.mode == "RGBA":
+        return image.point(list(lut) + list(range(256)))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image.point(lut)
+
+def apply_channel_scale(image, r_factor=1.0, g_factor=1.0, b_factor=1.0):
+    """
+    Scale each RGB channel through a cached lookup table.
+
+    :param image: PIL Image object.
+    :param r_factor: Multiplier for the red channel.
+    :param g_factor: Multiplier for the green channel.
+    :param b_factor: Multiplier for the blue channel.
+    :return: Image with the channels scaled and clipped to 0..255.
+    """
+    return apply_lut(image, channel_scale_lut(r_factor, g_factor, b_factor))
+
+# Tables for the built-in tints, built once at import.
+COOL_LUT = channel_scale_lut(0.9, 1.0, 1.2)
+WARM_LUT = channel_scale_lut(1.2, 1.0, 0.9)
+VINTAGE_LUT = channel_scale_lut(1.1, 1.1, 0.9)
+FILM_LUT = channel_scale_lut(1.2, 1.1, 0.9)
+POLAROID_LUT = channel_scale_lut(1.1, 1.1, 1.3)
+LOMO_LUT = channel_scale_lut(1.1, 1.0, 0.9)
@@ -0,0 +1,243 @@
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import json
+import os
+import threading
+import types
+
+# Bytes read at a time when hashing input files.
+HASH_CHUNK_SIZE = 1 << 20
+
+# Part of every key; bump it when effect helpers or encoding change the
+# output of unchanged effect functions.
+CACHE_VERSION = 1
+
+@lru_cache(maxsize=256)
+def _file_digest(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def file_digest(path):
+    """
+    SHA-256 of a file's content. Digests are memoized per path, modification
+    time and size, so an unchanged upload is hashed once.
+
+    :param path: File path.
+    :return: Hex digest.
+    """
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def normalize_params(params):
+    """
+    Canonical text form of effect parameters: keys sorted, tuples as lists,
+    floats by their shortest repr, anything else by str().
+    """
+    return json.dumps(params or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+def _code_digest(digest, code):
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        # Nested functions are hashed by their own code; their repr holds an address
+        if isinstance(const, types.CodeType):
+            _code_digest(digest, const)
+        else:
+            digest.update(repr(const).encode())
+
+def effect_version(effect):
+    """
+    Version of an effect's implementation, so cached results are not served
+    after its code changes. Only the effect function's own bytecode is
+    hashed; changes to the helpers it calls need a CACHE_VERSION bump.
+
+    :param effect: Effect function, or None.
+    :return: Hex digest.
+    """
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    code = getattr(effect, "__code__", None)
+    if code is not None:
+        _code_digest(digest, code)
+    return digest.hexdigest()
+
+def result_key(input_path, effect, params=None, seed=None, profile=None, max_bytes=None, extension="", version=None):
+    """
+    Cache key of a processed result.
+
+    :param input_path: Path of the input image; its content is hashed, not its name.
+    :param effect: Effect name.
+    :param params: Dict of effect parameters.
+    :param seed: Seed of a stochastic effect.
+    :param profile: Encoding profile name.
+    :param max_bytes: Byte budget of the encoding.
+    :param extension: Output file extension, which selects the format.
+    :param version: Implementation version from effect_version; defaults to CACHE_VERSION.
+    :return: Hex digest.
+    """
+    parts = [
+        version or CACHE_VERSION, file_digest(input_path), effect, normalize_params(params),
+        repr(seed), profile, repr(max_bytes), extension.lower(),
+    ]
+    return hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()
+
+class ResultCache:
+    """
+    Store of encoded results addressed by result_key.
+
+    Files live in a folder shared by every process using it. The folder is
+    bounded by total size, evicting the least recently used files first;
+    use is recorded in each file's modification time so all processes see
+    it. The most recently used results are also kept in this process's
+    memory so hits never touch the disk. Counters of hits, misses and
+    evictions are kept per process for monitoring.
+    """
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024, memory_bytes=64 * 1024 * 1024):
+        """
+        :param folder: Folder of the disk store, created if missing.
+        :param max_bytes: Maximum total size of the disk store, across all processes.
+        :param memory_bytes: Maximum total size of this process's in-memory tier.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._stats = {"hits": 0, "memory_hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, key)
+
+    def _remember(self, key, data):
+        # Add to the memory tier, dropping its least recently used entries
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, dropped = self._memory.popitem(last=False)
+            self._memory_size -= len(dropped)
+
+    def _entries(self):
+        # (mtime, size, key) of every stored file, oldest use first
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name))
+        return sorted(entries)
+
+    def _touch(self, key):
+        # Record the use for least recently used eviction in every process
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        Delete the least recently used files until the folder fits its budget.
+
+        :return: Number of files deleted.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                if key in self._memory:
+                    self._memory_size -= len(self._memory.pop(key))
+        with self._lock:
+            self._stats["evictions"] += removed
+        return removed
+
+    def get(self, key):
+        """
+        Look up an encoded result, in memory first, then in the shared folder.
+
+        :param key: Key from result_key.
+        :return: Encoded bytes, or None on a miss.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+        if data is not None:
+            self._touch(key)
+            return data
+        try:
+            with open(self._path(key), "rb") as source:
+                data = source.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        self._touch(key)
+        with self._lock:
+            self._remember(key, data)
+            self._stats["hits"] += 1
+        return data
+
+    def put(self, key, data):
+        """
+        Store an encoded result, evicting older ones to stay within budget.
+
+        :param key: Key from result_key.
+        :param data: Encoded bytes.
+        """
+        path = self._path(key)
+        # Rename into place so other processes never read a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as target:
+            target.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._remember(key, data)
+        self.evict()
+
+    def stats(self):
+        """
+        :return: Dict of this process's hits (memory_hits of them served from
+                 memory), misses and evictions, with the entries and bytes
+                 stored in the shared folder and this process's memory.
+        """
+        entries = self._entries()
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(entries),
+                "disk_bytes": sum(size for _, size, _ in entries),
+                "memory_bytes": self._memory_size,
+            }
+
+def get_result_cache(app):
+    """
+    :param app: Flask app.
+    :return: The app's result cache, created from its config on first use.
+    """
+    if "result_cache" not in app.extensions:
+        app.extensions.setdefault("result_cache", ResultCache(
+            app.config["RESULT_CACHE_FOLDER"],
+            app.config["RESULT_CACHE_MAX_BYTES"],
+            app.config["RESULT_CACHE_MEMORY_BYTES"],
+        ))
+    return app.extensions["result_cache"]
@@ -0,0 +1,40 @@
+import numpy as np
+
+def make_rng(seed=None):
+    """
+    Build the random generator an effect draws from, so effects never touch
+    the global numpy.random state and can run concurrently.
+
+    :param seed: Integer seed, numpy.random.Generator (used as is), or None
+                 for fresh entropy.
+    :return: numpy.random.Generator backed by PCG64.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.Generator(np.random.PCG64(seed))
+
+def spawn_rngs(seed, count):
+    """
+    Derive independent generators from one seed, e.g. one per tile, so the
+    parts of an image never repeat each other's noise.
+
+    :param seed: Integer seed, numpy.random.Generator, or None.
+    :param count: Number of generators.
+    :return: List of numpy.random.Generator objects.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed.spawn(count)
+    return [np.random.Generator(np.random.PCG64(child)) for child in np.random.SeedSequence(seed).spawn(count)]
+
+def normal(rng, scale, shape):
+    """
+    Zero-mean normal noise drawn in float32.
+
+    :param rng: numpy.random.Generator.
+    :param scale: Standard deviation.
+    :param shape: Output shape.
+    :return: float32 array.
+    """
+    noise = rng.standard_normal(shape, dtype=np.float32)
+    noise *= scale
+    return noise
@@ -89,5 +89,43 @@ document.addEventListener('DOMContentLoaded', (event) => {
             }
         }
     }
-    initComparisons();
+    function pollJob(jobStatus) {
+        let message = document.getElementById('job-message');
+        let cancelButton = document.getElementById('cancel-job');
+        cancelButton.addEventListener('click', function () {
+            fetch(jobStatus.dataset.cancelUrl, { method: 'POST' });
+        });
+        function poll() {
+            fetch(jobStatus.dataset.statusUrl)
+            .then(response => response.json())
+            .then(job => {
+                if (job.status === 'queued' || job.status === 'running') {
+                    message.textContent = job.status === 'queued' ? 'Waiting in queue...' : 'Processing...';
+                    setTimeout(poll, 500);
+                } else if (job.status === 'done' && jobStatus.dataset.kind === 'save') {
+                    message.textContent = 'Image saved';
+                    cancelButton.hidden = true;
+                } else if (job.status === 'done') {
+                    let afterImage = document.getElementById('after-image');
+                    afterImage.addEventListener('load', function () {
+                        jobStatus.hidden = true;
+                        document.getElementById('image-compare').hidden = false;
+                        initComparisons();
+                    }, { once: true });
+                    afterImage.src = job.result_url;
+                } else {
+                    message.textContent = 'Job ' + job.status + (job.error ? ': ' + job.error : '');
+                    cancelButton.hidden = true;
+                }
+            });
+        }
+        poll();
+    }
+
+    let jobStatus = document.getElementById('job-status');
+    if (jobStatus) {
+        pollJob(jobStatus);
+    } else {
+        initComparisons();
+    }
 });
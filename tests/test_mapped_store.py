@@ -0,0 +1,38 @@
+import os
+import sys
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapped_store import HEADER_SIZE, read_mapped, write_mapped
+
+def _gradient(mode):
+    pixels = np.arange(4 * 3 * 3, dtype=np.uint8).reshape(3, 4, 3)
+    return Image.fromarray(pixels, "RGB").convert(mode)
+
+def _poke(path, offset, value):
+    # Change one stored byte through a separate writable mapping of the file
+    stored = np.memmap(path, dtype=np.uint8, mode="r+", offset=HEADER_SIZE)
+    stored[offset] = value
+    stored.flush()
+    del stored
+
+def test_rgb_is_mapped_in_place(tmp_path):
+    path = str(tmp_path / "image.pix")
+    write_mapped(path, _gradient("RGB"))
+    image = read_mapped(path)
+    assert image.mode == "RGBX"
+    assert image.readonly
+    assert image.convert("RGB").tobytes() == _gradient("RGB").tobytes()
+    # Second pixel, green channel, in the four bytes a pixel layout
+    _poke(path, 4 + 1, 255)
+    assert image.getpixel((1, 0))[1] == 255
+
+def test_grayscale_is_mapped_in_place(tmp_path):
+    path = str(tmp_path / "image.pix")
+    write_mapped(path, _gradient("L"))
+    image = read_mapped(path)
+    assert image.mode == "L"
+    _poke(path, 5, 200)
+    assert image.getpixel((1, 1)) == 200
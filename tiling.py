@@ -0,0 +1,238 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+from PIL import Image, ImageStat
+from effect_traits import effect_radius, is_stochastic
+from seeding import spawn_rngs
+
+# Tiles are square, this many pixels on a side before the halo is added.
+DEFAULT_TILE_SIZE = 1024
+
+# Output array shapes per image mode; modes missing here are not tiled.
+MODE_CHANNELS = {"L": 1, "RGB": 3, "RGBA": 4}
+
+# Threaded runs use smaller tiles so every core gets several of them.
+PARALLEL_TILE_SIZE = 512
+
+def tile_boxes(width, height, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Split an image area into tiles, row by row.
+
+    :param width: Image width.
+    :param height: Image height.
+    :param tile_size: Tile side in pixels; tiles on the right and bottom edges may be smaller.
+    :return: List of (left, upper, right, lower) boxes covering the image.
+    """
+    return [
+        (left, upper, min(left + tile_size, width), min(upper + tile_size, height))
+        for upper in range(0, height, tile_size)
+        for left in range(0, width, tile_size)
+    ]
+
+def _with_halo(box, radius, width, height):
+    left, upper, right, lower = box
+    return (max(0, left - radius), max(0, upper - radius), min(width, right + radius), min(height, lower + radius))
+
+def allocate_output(size, mode, path=None):
+    """
+    Preallocate the pixel buffer a tiled run writes into.
+
+    :param size: Tuple (width, height).
+    :param mode: "L", "RGB" or "RGBA".
+    :param path: File to back the buffer with a memory map, so the result
+                 never has to fit in RAM; None keeps it in memory.
+    :return: uint8 array of shape (height, width) or (height, width, channels).
+    """
+    width, height = size
+    shape = (height, width) if MODE_CHANNELS[mode] == 1 else (height, width, MODE_CHANNELS[mode])
+    if path is None:
+        return np.empty(shape, dtype=np.uint8)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+
+def _array_mode(array):
+    if array.ndim == 2:
+        return "L"
+    return {channels: mode for mode, channels in MODE_CHANNELS.items()}[array.shape[2]]
+
+def can_tile(effect, **params):
+    """
+    Check whether an effect can run tile by tile.
+
+    :param effect: Effect function.
+    :param params: Keyword arguments the effect will be called with.
+    :return: True if the effect declares a neighbourhood radius (pointwise
+             effects count as radius 0), a two-pass or a global stats form.
+    """
+    return (
+        hasattr(effect, "two_pass")
+        or hasattr(effect, "global_stats")
+        or effect_radius(effect, params) is not None
+    )
+
+def apply_tiled(image, effect, tile_size=DEFAULT_TILE_SIZE, output=None, workers=1, **params):
+    """
+    Apply an effect one tile at a time.
+
+    Each tile is cropped with a halo of the effect's neighbourhood radius, so
+    local filters see the same pixels as on the whole image, and only the
+    tile's own area is kept. Effects that need global statistics run their
+    two-pass form: statistics are collected per tile and merged before any
+    tile is processed. Effects that declare neither run on the whole image.
+
+    Stochastic effects get an independent generator per tile, derived from
+    their ``seed``, so tiles never repeat each other's noise and the result
+    is reproducible for a given seed and tile size.
+
+    With several workers, tiles are processed on a thread pool. Pillow,
+    OpenCV and NumPy release the GIL inside filters, lookups and blends, so
+    the tiles run on separate cores.
+
+    :param image: PIL Image object.
+    :param effect: Effect function.
+    :param tile_size: Tile side in pixels.
+    :param output: Preallocated array from allocate_output, or None to allocate one
+                   once the output mode is known.
+    :param workers: Number of threads processing tiles.
+    :param params: Additional arguments for the effect.
+    :return: PIL Image object sharing memory with the output array.
+    """
+    if not can_tile(effect, **params):
+        return effect(image, **params)
+    image.load()
+    width, height = image.size
+    boxes = tile_boxes(width, height, tile_size)
+    radius = effect_radius(effect, params) or 0
+
+    def crop(box):
+        # Tile with its halo, and the tile's own area within it
+        halo = _with_halo(box, radius, width, height)
+        left, upper = box[0] - halo[0], box[1] - halo[1]
+        return image.crop(halo), (left, upper, left + box[2] - box[0], upper + box[3] - box[1])
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if hasattr(effect, "global_stats"):
+            compute, apply = effect.global_stats
+            stats = compute(image, **params)
+            process = lambda tile, index: apply(tile, stats, **params)
+        elif hasattr(effect, "two_pass"):
+            collect, apply, merge = effect.two_pass
+            stats = merge(list(pool.map(lambda box: collect(*crop(box), **params), boxes)))
+            process = lambda tile, index: apply(tile, stats, **params)
+        elif is_stochastic(effect):
+            rngs = spawn_rngs(params.get("seed"), len(boxes))
+            process = lambda tile, index: effect(tile, **{**params, "seed": rngs[index]})
+        else:
+            process = lambda tile, index: effect(tile, **params)
+
+        def run(index, mode):
+            box = boxes[index]
+            tile, inner = crop(box)
+            output[box[1]:box[3], box[0]:box[2]] = np.asarray(process(tile, index).crop(inner).convert(mode))
+
+        # The first tile decides the output mode when no buffer is given
+        indices = range(len(boxes))
+        if output is None:
+            tile, inner = crop(boxes[0])
+            first = process(tile, 0).crop(inner)
+            mode = first.mode if first.mode in MODE_CHANNELS else "RGB"
+            output = allocate_output(image.size, mode)
+            output[boxes[0][1]:boxes[0][3], boxes[0][0]:boxes[0][2]] = np.asarray(first.convert(mode))
+            indices = indices[1:]
+        mode = _array_mode(output)
+        for _ in pool.map(lambda index: run(index, mode), indices):
+            pass
+    return Image.fromarray(output)
+
+def apply_parallel(image, effect, workers=None, tile_size=PARALLEL_TILE_SIZE, **params):
+    """
+    Spread one image over several cores by processing its tiles on a thread pool.
+
+    :param image: PIL Image object.
+    :param effect: Effect function; effects that cannot be tiled run whole.
+    :param workers: Number of threads; defaults to the number of CPUs.
+    :param tile_size: Tile side in pixels.
+    :param params: Additional arguments for the effect.
+    :return: Processed image.
+    """
+    return apply_tiled(image, effect, tile_size, workers=workers or os.cpu_count() or 1, **params)
+
+def histogram_mean(histogram):
+    """
+    Mean pixel level of a 256-bin histogram, computed as ImageStat does.
+    """
+    return ImageStat.Stat([int(count) for count in histogram]).mean[0]
+
+def contrast_lut(histogram, factor):
+    """
+    Lookup table equivalent to ImageEnhance.Contrast on an image with the
+    given grayscale histogram.
+
+    :param histogram: 256-bin histogram of the image converted to "L".
+    :param factor: Contrast enhancement factor.
+    :return: List of 256 output levels.
+    """
+    mean = int(histogram_mean(histogram) + 0.5)
+    ramp = Image.frombytes("L", (256, 1), bytes(range(256)))
+    return list(Image.blend(Image.new("L", (256, 1), mean), ramp, factor).tobytes())
+
+def autocontrast_lut(histogram, cutoff=0):
+    """
+    Lookup table equivalent to ImageOps.autocontrast on a single band with
+    the given histogram.
+
+    :param histogram: 256-bin histogram of the band.
+    :param cutoff: Percent of pixels to cut off from each end of the histogram.
+    :return: List of 256 output levels.
+    """
+    h = [int(count) for count in histogram]
+    if cutoff:
+        n = sum(h)
+        cut = int(n * cutoff // 100)
+        for lo in range(256):
+            removed = min(cut, h[lo])
+            h[lo] -= removed
+            cut -= removed
+            if cut <= 0:
+                break
+        cut = int(n * cutoff // 100)
+        for hi in range(255, -1, -1):
+            removed = min(cut, h[hi])
+            h[hi] -= removed
+            cut -= removed
+            if cut <= 0:
+                break
+    used = [level for level in range(256) if h[level]]
+    if not used or used[-1] <= used[0]:
+        return list(range(256))
+    lo, hi = used[0], used[-1]
+    scale = 255.0 / (hi - lo)
+    offset = -lo * scale
+    return [min(255, max(0, int(level * scale + offset))) for level in range(256)]
+
+def remap_histogram(histogram, lut):
+    """
+    Histogram of an image after mapping it through a lookup table.
+    """
+    return np.bincount(np.asarray(lut), weights=np.asarray(histogram), minlength=256).astype(np.int64)
+
+def grayscale_histogram(tile, box, **params):
+    """
+    Collect step for two-pass effects: histogram of the tile's own area after
+    conversion to "L".
+    """
+    return np.array(tile.crop(box).convert("L").histogram(), dtype=np.int64)
+
+def contrast_tile(tile, histogram, factor=1.5):
+    """
+    Apply step equivalent to ImageEnhance.Contrast, which blends every band
+    with the mean gray level of the whole image.
+
+    :param tile: PIL Image object.
+    :param histogram: Grayscale histogram of the whole image.
+    :param factor: Contrast enhancement factor.
+    :return: Processed tile.
+    """
+    lut = contrast_lut(histogram, factor)
+    if tile.mode == "RGBA":
+        return tile.point(lut * 3 + list(range(256)))
+    return tile.point(lut * len(tile.getbands()))
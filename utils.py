@@ -1,8 +1,15 @@
 import os
+import uuid
 from PIL import Image
 from flask import current_app
 from werkzeug.utils import secure_filename
 import effects_aggregator
+import tiling
+import encoding
+import result_cache
+import decoded_cache
+import mapped_store
+from effect_traits import is_stochastic, scaled_params
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
@@ -13,10 +20,122 @@ def save_file(file, folder):
     file.save(file_path)
     return filename, file_path
 
-def process_image(input_image_path, effect):
+def make_proxy(input_image_path, proxy_folder, long_edge):
+    """
+    Write a downscaled copy of an upload for interactive previews.
+
+    :param input_image_path: Path to the uploaded image.
+    :param proxy_folder: Folder to save the proxy to, under the upload's name.
+    :param long_edge: Maximum size of the proxy's longer side.
+    :return: Tuple of (proxy path, resize factor), or (input_image_path, None)
+             if the upload is already small enough.
+    """
     image = Image.open(input_image_path)
-    if effect in effects_aggregator.effects:
-        image = effects_aggregator.effects[effect](image)
-    output_image_path = os.path.join(current_app.config['PROCESSED_FOLDER'], os.path.basename(input_image_path))
-    image.save(output_image_path)
+    width = image.size[0]
+    if max(image.size) <= long_edge:
+        return input_image_path, None
+    # thumbnail decodes JPEGs at a reduced DCT scale before resampling
+    image.thumbnail((long_edge, long_edge), Image.LANCZOS)
+    os.makedirs(proxy_folder, exist_ok=True)
+    proxy_path = os.path.join(proxy_folder, os.path.basename(input_image_path))
+    encoding.save_image(image, proxy_path, 'archive')
+    return proxy_path, image.size[0] / width
+
+def open_upload(path):
+    """
+    Decode an uploaded image, reusing the app's decoded image cache when
+    DECODED_CACHE_MAX_BYTES is set, and the pixels other worker processes
+    stored when MAPPED_STORE_FOLDER is set.
+
+    :param path: Image file path.
+    :return: PIL Image object; modifying it never affects the cached copy.
+    """
+    if current_app.config.get('DECODED_CACHE_MAX_BYTES'):
+        image = decoded_cache.get_decoded_cache(current_app).get(path)
+    elif current_app.config.get('MAPPED_STORE_FOLDER'):
+        image = mapped_store.get_mapped_store(current_app).get(path)
+    else:
+        return Image.open(path)
+    # Mapped RGB pixels come back as an RGBX view; effects expect RGB
+    return image.convert('RGB') if image.mode == 'RGBX' else image
+
+def forget_upload(*paths):
+    """
+    Drop the cached decodes of uploads that were replaced or abandoned.
+
+    :param paths: Image file paths.
+    """
+    if current_app.config.get('DECODED_CACHE_MAX_BYTES'):
+        decoded_cache.get_decoded_cache(current_app).invalidate(*paths)
+    if current_app.config.get('MAPPED_STORE_FOLDER'):
+        store = mapped_store.get_mapped_store(current_app)
+        for path in paths:
+            if os.path.exists(path):
+                store.invalidate(path)
+
+def _write_bytes(path, data):
+    # Rename into place so a result being served is never half written
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'wb') as target:
+        target.write(data)
+    os.replace(temp_path, path)
+
+def process_image(input_image_path, effect, output_folder=None, final=False, params=None, proxy=None, output_name=None):
+    """
+    Apply an effect to an uploaded image and save the result.
+
+    Results are cached by input content, effect, parameters and encoding
+    (see result_cache), so applying the same effect again only copies the
+    stored file. Stochastic effects without a seed draw new noise every time
+    and are not cached.
+    
+    :param input_image_path: Path to the uploaded image.
+    :param effect: Name of the effect to apply.
+    :param output_folder: Folder to save to; defaults to PROCESSED_FOLDER.
+    :param final: Encode with the final profile instead of the preview one.
+    :param params: Dict of additional arguments for the effect.
+    :param proxy: Tuple (proxy path, resize factor) from make_proxy to
+                  preview on, or None. Every effect runs on the proxy, with
+                  its declared pixel parameters rescaled. Effects with fixed
+                  3x3 kernels (Sharpen, Edge, Emboss, Line Drawing, HDR) and
+                  the film grain effects, whose grain is one pixel wide at
+                  any size, look somewhat stronger on the proxy than on the
+                  full resolution render.
+    :param output_name: File name to save under; defaults to the input's name.
+    :return: Path of the saved image.
+    """
+    params = params or {}
+    config = current_app.config
+    output_image_path = os.path.join(output_folder or config['PROCESSED_FOLDER'], output_name or os.path.basename(input_image_path))
+    if final:
+        profile, max_bytes = config['FINAL_PROFILE'], config['FINAL_MAX_BYTES']
+    else:
+        profile, max_bytes = config['PREVIEW_PROFILE'], config['PREVIEW_MAX_BYTES']
+    effect_function = effects_aggregator.effects.get(effect)
+    source_path = input_image_path
+    if proxy is not None:
+        source_path, scale = proxy
+        if effect_function is not None:
+            params = {**scaled_params(effect_function, scale), **params}
+    cache, key = None, None
+    if config.get('RESULT_CACHE_FOLDER') and not (is_stochastic(effect_function) and params.get('seed') is None):
+        cache = result_cache.get_result_cache(current_app)
+        key = result_cache.result_key(source_path, effect if effect_function else None, params, params.get('seed'),
+                                      profile, max_bytes, os.path.splitext(output_image_path)[1],
+                                      result_cache.effect_version(effect_function))
+        data = cache.get(key)
+        if data is not None:
+            _write_bytes(output_image_path, data)
+            return output_image_path
+
+    image = open_upload(source_path)
+    if effect_function is not None:
+        if image.size[0] * image.size[1] >= config['PARALLEL_MIN_PIXELS']:
+            image = tiling.apply_parallel(image, effect_function, config['PARALLEL_WORKERS'], **params)
+        else:
+            image = effect_function(image, **params)
+    data = encoding.encode(image, encoding.format_for_path(output_image_path), profile, max_bytes)
+    _write_bytes(output_image_path, data)
+    if cache is not None:
+        cache.put(key, data)
     return output_image_path
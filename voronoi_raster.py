@@ -0,0 +1,99 @@
+import numpy as np
+from PIL import Image
+from scipy.spatial import cKDTree
+from scipy.ndimage import binary_dilation
+from block_reduce import block_expand
+from seeding import make_rng
+
+# Points per nearest-seed query, bounds the coordinate buffers.
+CHUNK_POINTS = 1 << 20
+
+def _query(tree, points):
+    """
+    Nearest-seed index for an (N, 2) array of points, queried in chunks.
+    """
+    nearest = np.empty(len(points), dtype=np.int32)
+    for start in range(0, len(points), CHUNK_POINTS):
+        _, nearest[start:start + CHUNK_POINTS] = tree.query(points[start:start + CHUNK_POINTS], k=1, workers=-1)
+    return nearest
+
+def voronoi_labels(width, height, seeds, step=None):
+    """
+    Label every pixel with the index of its nearest seed.
+
+    Seeds are first queried on a coarse lattice of block corners. Voronoi
+    cells are convex, so a block whose four corners share a seed lies wholly
+    in that cell; only blocks straddling a cell border are queried per pixel.
+
+    :param width: Image width in pixels.
+    :param height: Image height in pixels.
+    :param seeds: Float array of shape (N, 2) holding (x, y) seed positions.
+    :param step: Coarse block size in pixels; derived from the cell size by default.
+    :return: int32 array of shape (height, width).
+    """
+    tree = cKDTree(seeds)
+    if step is None:
+        step = int(np.clip(np.sqrt(width * height / len(seeds)) / 4, 1, 16))
+    # Corner samples sit on pixel centres so each block's pixels lie inside them
+    xs = np.arange(0, width + step, step, dtype=np.float64) + 0.5
+    ys = np.arange(0, height + step, step, dtype=np.float64) + 0.5
+    corners = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+    coarse = _query(tree, corners).reshape(len(ys), len(xs))
+
+    top_left = coarse[:-1, :-1]
+    uniform = (top_left == coarse[1:, :-1]) & (top_left == coarse[:-1, 1:]) & (top_left == coarse[1:, 1:])
+    labels = np.ascontiguousarray(block_expand(top_left[:, :, None], step, step, height, width)[:, :, 0])
+
+    if step > 1:
+        offsets = np.stack(np.meshgrid(np.arange(step), np.arange(step)), axis=-1).reshape(-1, 2)
+        mixed = np.argwhere(~uniform)[:, ::-1] * step
+        blocks_per_chunk = max(1, CHUNK_POINTS // len(offsets))
+        for start in range(0, len(mixed), blocks_per_chunk):
+            pixels = (mixed[start:start + blocks_per_chunk, None] + offsets).reshape(-1, 2)
+            pixels = pixels[(pixels[:, 0] < width) & (pixels[:, 1] < height)]
+            labels[pixels[:, 1], pixels[:, 0]] = _query(tree, pixels + 0.5)
+    return labels
+
+def cell_edges(labels, edge_width=1):
+    """
+    Mark pixels on the border between two cells.
+
+    :param labels: Label array from voronoi_labels.
+    :param edge_width: Edge thickness in pixels.
+    :return: Boolean array of the same shape as labels.
+    """
+    edges = np.zeros(labels.shape, dtype=bool)
+    edges[:, 1:] |= labels[:, 1:] != labels[:, :-1]
+    edges[1:] |= labels[1:] != labels[:-1]
+    if edge_width > 1:
+        edges = binary_dilation(edges, iterations=edge_width - 1)
+    return edges
+
+def voronoi_mosaic(image, num_points=100, seed=None, edge_width=0, edge_color=(0, 0, 0)):
+    """
+    Fill the frame with Voronoi cells colored by the mean of the pixels they cover.
+
+    :param image: PIL Image object.
+    :param num_points: Number of Voronoi cells.
+    :param seed: Integer seed or numpy.random.Generator for reproducible cells.
+    :param edge_width: Width of the drawn cell edges; 0 disables them.
+    :param edge_color: RGB color of the cell edges.
+    :return: RGB image.
+    """
+    rgb = np.asarray(image.convert("RGB"))
+    height, width = rgb.shape[:2]
+    rng = make_rng(seed)
+    seeds = rng.random((num_points, 2)) * [width, height]
+
+    labels = voronoi_labels(width, height, seeds)
+    flat = labels.ravel()
+    counts = np.maximum(np.bincount(flat, minlength=num_points), 1)
+    colors = np.empty((num_points, 3), dtype=np.uint8)
+    for c in range(3):
+        sums = np.bincount(flat, weights=rgb[:, :, c].ravel(), minlength=num_points)
+        colors[:, c] = np.rint(sums / counts)
+
+    output = colors[labels]
+    if edge_width:
+        output[cell_edges(labels, edge_width)] = edge_color
+    return Image.fromarray(output)